@@ -0,0 +1,73 @@
+"""
+Benchmarks the time and memory it takes to deserialize the 100k vertices of a
+large traversal result, with and without compact storage.
+
+    python benchmarks/bench_element_storage.py
+"""
+import gc
+import time
+from uuid import uuid4
+
+from thunderdome import properties
+from thunderdome.models import Element, Vertex
+
+
+COLUMNS = 20
+
+
+def wide_columns():
+    return dict(('col{}'.format(i), properties.Integer()) for i in range(COLUMNS))
+
+
+BenchRegularVertex = type('BenchRegularVertex', (Vertex,), wide_columns())
+BenchCompactVertex = type('BenchCompactVertex', (Vertex,), dict(wide_columns(), __compact_storage__=True))
+
+
+def rss_kb():
+    """ Returns the resident memory of the process in kB, if it can be read """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except IOError:
+        return None
+
+
+def traversal_result(klass, count):
+    element_type = klass.get_element_type()
+    results = []
+    for i in range(count):
+        result = {'_id': i, '_type': 'vertex', 'element_type': element_type, 'vid': str(uuid4())}
+        result.update(('col{}'.format(c), i + c) for c in range(COLUMNS))
+        results.append(result)
+    return results
+
+
+def measure(klass, count):
+    results = traversal_result(klass, count)
+    gc.collect()
+    objects = len(gc.get_objects())
+    rss = rss_kb()
+
+    start = time.time()
+    elements = [Element.deserialize(r) for r in results]
+    elapsed = time.time() - start
+
+    gc.collect()
+    objects = (len(gc.get_objects()) - objects) / float(count)
+    memory = (rss_kb() - rss) * 1024.0 / count if rss is not None else float('nan')
+    del elements
+    return elapsed, objects, memory
+
+
+def main(count=100000):
+    print '{} vertices with {} columns'.format(count, COLUMNS)
+    for name, klass in [('regular', BenchRegularVertex), ('compact', BenchCompactVertex)]:
+        elapsed, objects, memory = measure(klass, count)
+        print '{:<10} {:>8.3f} s {:>8.1f} tracked objects/vertex {:>10.0f} bytes/vertex'.format(
+            name, elapsed, objects, memory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmarks deserializing a wide model whose columns need conversion, reading
+only a couple of them, with eager and lazy conversion.
+
+    python benchmarks/bench_lazy_conversion.py
+"""
+import time
+from uuid import uuid4
+
+from thunderdome import properties
+from thunderdome.models import Element, Vertex
+
+
+def wide_columns():
+    columns = {}
+    for i in range(10):
+        columns['created{}'.format(i)] = properties.DateTime()
+        columns['price{}'.format(i)] = properties.Decimal()
+        columns['ref{}'.format(i)] = properties.UUID()
+    return columns
+
+
+BenchEagerVertex = type('BenchEagerVertex', (Vertex,), dict(wide_columns(), __compact_storage__=True))
+BenchLazyVertex = type('BenchLazyVertex', (Vertex,), dict(wide_columns(), __lazy_conversion__=True))
+
+
+def traversal_result(klass, count):
+    element_type = klass.get_element_type()
+    results = []
+    for i in range(count):
+        result = {'_id': i, '_type': 'vertex', 'element_type': element_type, 'vid': str(uuid4())}
+        for c in range(10):
+            result['created{}'.format(c)] = 1370000000 + i
+            result['price{}'.format(c)] = '{}.99'.format(i)
+            result['ref{}'.format(c)] = str(uuid4())
+        results.append(result)
+    return results
+
+
+def main(count=20000):
+    print '{} vertices with 31 columns'.format(count)
+    for name, klass in [('eager', BenchEagerVertex), ('lazy', BenchLazyVertex)]:
+        results = traversal_result(klass, count)
+        start = time.time()
+        elements = [Element.deserialize(r) for r in results]
+        built = time.time() - start
+        for element in elements:
+            element.created0, element.price0
+        read = time.time() - start - built
+        print '{:<8} {:>8.1f} us/vertex to build {:>8.1f} us/vertex to read 2 columns'.format(
+            name, built / count * 1000000, read / count * 1000000)
+
+
+if __name__ == '__main__':
+    main()
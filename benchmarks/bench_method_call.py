@@ -0,0 +1,32 @@
+"""
+Benchmarks the python-side overhead of calling a gremlin method, with the
+query itself stubbed out.
+
+    python benchmarks/bench_method_call.py
+"""
+from timeit import timeit
+
+from thunderdome import gremlin
+from thunderdome import properties
+from thunderdome.models import Vertex
+
+
+class BenchCallVertex(Vertex):
+    name = properties.String()
+
+
+def main(number=100000):
+    gremlin.execute_query = lambda *args, **kwargs: []
+    v = BenchCallVertex(_id=1)
+
+    cases = [
+        ('positional', lambda: v._traversal('outV', ['follows'], 0, 10, None)),
+        ('keyword', lambda: v._traversal(operation='outV', labels=['follows'], start=0, end=10, element_types=None)),
+    ]
+    for name, call in cases:
+        elapsed = timeit(call, number=number)
+        print '{:<20} {:>10.2f} us/call'.format(name, elapsed / number * 1000000)
+
+
+if __name__ == '__main__':
+    main()
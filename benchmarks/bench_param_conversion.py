@@ -0,0 +1,39 @@
+"""
+Benchmarks translating large nested gremlin method parameters into their
+database values.
+
+    python benchmarks/bench_param_conversion.py
+"""
+from datetime import datetime
+from timeit import timeit
+from uuid import uuid4
+
+from thunderdome import gremlin
+from thunderdome import properties
+from thunderdome.models import Vertex
+
+
+class BenchParamVertex(Vertex):
+    name = properties.String()
+
+
+def main(number=20):
+    method = gremlin.GremlinMethod()
+    vids = [str(uuid4()) for i in range(10000)]
+    uuids = [uuid4() for i in range(10000)]
+    elements = [BenchParamVertex(_id=i) for i in range(10000)]
+    nested = {'pages': [{'vids': vids[i:i+100], 'at': datetime.now()} for i in range(0, 10000, 100)]}
+
+    cases = [
+        ('10k vids', {'vids': vids}),
+        ('10k uuids', {'uuids': uuids}),
+        ('10k elements', {'elements': elements}),
+        ('100 nested pages', nested),
+    ]
+    for name, params in cases:
+        elapsed = timeit(lambda: method.transform_params_to_database(params), number=number)
+        print '{:<20} {:>10.3f} ms/call'.format(name, elapsed / number * 1000)
+
+
+if __name__ == '__main__':
+    main()
@@ -42,4 +42,7 @@ setup(
     license='BSD',
     packages=find_packages(),
     include_package_data=True,
+    entry_points={
+        'console_scripts': ['thunderdome-load = thunderdome.bulk:main'],
+    },
 )
@@ -20,7 +20,7 @@ import os
 
 from thunderdome.properties import *
 from thunderdome.exceptions import *
-from thunderdome.models import PaginatedVertex, Vertex, Edge, IN, OUT
+from thunderdome.models import PaginatedVertex, Vertex, Edge, IN, OUT, BOTH, prefetch_vertices
 from thunderdome.gremlin import BaseGremlinMethod, GremlinMethod, GremlinValue, GremlinTable
 from thunderdome.containers import Table
 
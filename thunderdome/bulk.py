@@ -0,0 +1,432 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Streaming bulk loader writing vertices and edges read from JSONL or CSV files
+into the graph in batches.
+
+Vertex records carry the `element_type` of a registered vertex model, edge
+records the `label` of a registered edge model along with the vids of the
+vertices it connects as `outV` and `inV`. All other fields are passed to the
+model as properties. Alternatively a single model can be given for all the
+records.
+
+From the command line::
+
+    python -m thunderdome.bulk --graph graph --models myapp.models vertices.jsonl
+"""
+
+import argparse
+import csv
+from collections import deque, OrderedDict
+import importlib
+import json
+import logging
+from multiprocessing.pool import ThreadPool
+import os
+import sys
+import time
+
+from thunderdome import connection
+from thunderdome.exceptions import ThunderdomeException
+from thunderdome.models import Vertex, Edge, vertex_types, edge_types
+
+
+logger = logging.getLogger(__name__)
+
+# record fields naming the model and endpoints of an element
+_reserved_fields = ('element_type', 'label', 'outV', 'inV')
+
+
+def read_records(stream, format='jsonl'):
+    """
+    Yields the records of a JSONL or CSV stream as dicts. Empty CSV fields are
+    left out so the model defaults apply.
+
+    :param stream: The file to read
+    :type stream: file
+    :param format: 'jsonl' or 'csv'
+    :type format: str
+    :rtype: generator of dict
+
+    """
+    if format == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    elif format == 'csv':
+        for row in csv.DictReader(stream):
+            yield dict((k, v) for k, v in row.items() if v != '')
+    else:
+        raise ThunderdomeException("Unknown record format '{}'".format(format))
+
+
+def _write_batch(klass, method_name, elements, payloads, host):
+    """
+    Saves a batch of elements in a single transaction on the given host.
+    """
+    klass._save_chunks(method_name, elements, payloads, max(len(elements), 1), host=host)
+
+
+class BulkLoader(object):
+    """
+    Loads a stream of records into the graph. Batches are written by a pool
+    of workers spread across the configured hosts, and reading stops while
+    `max_pending` batches are in flight. The record ranges of the committed
+    batches are stored in the checkpoint file, and a load given the same
+    checkpoint file skips the records already written.
+
+    Writes aren't idempotent, a batch that commits right before the load is
+    killed, before the checkpoint is written, is written again on resume and
+    its vertices are duplicated.
+    """
+
+    def __init__(self, model=None, batch_size=500, workers=4, max_pending=None,
+                 checkpoint=None, vid_cache_size=100000, strict=False, report_interval=10):
+        """
+        :param model: The model of all the records, by default it's looked up
+        from each record's element_type or label
+        :type model: Vertex or Edge
+        :param batch_size: The number of elements written per transaction
+        :type batch_size: int
+        :param workers: The number of batches written in parallel
+        :type workers: int
+        :param max_pending: The maximum number of batches in flight, defaults
+        to twice the number of workers
+        :type max_pending: int
+        :param checkpoint: Path of the file the load progress is stored in
+        :type checkpoint: str
+        :param vid_cache_size: The number of vid -> eid mappings kept to
+        resolve edge endpoints, least recently used mappings are dropped first
+        :type vid_cache_size: int
+        :param strict: If True invalid records abort the load, otherwise they
+        are logged and skipped
+        :type strict: boolean
+        :param report_interval: Number of seconds between throughput reports
+        :type report_interval: int or float
+
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_pending = max_pending or workers * 2
+        self.checkpoint = checkpoint
+        self.strict = strict
+        self.report_interval = report_interval
+        self.vid_cache_size = vid_cache_size
+        #private so the mappings aren't evicted by element invalidation
+        self.vid_cache = OrderedDict()
+        self.stats = {'vertices': 0, 'edges': 0, 'invalid': 0, 'batches': 0, 'offset': 0}
+
+    def load(self, records):
+        """
+        Loads the given records, returning the load statistics.
+
+        :param records: The records to load
+        :type records: iterable of dict
+        :rtype: dict
+
+        """
+        skip, written = self._read_checkpoint()
+        self._committed = list(written)
+        self.stats['offset'] = skip
+        self._started = self._reported = time.time()
+        self._pending = deque()
+        self._pool = ThreadPool(self.workers)
+        try:
+            batch = []
+            kind = None
+            start = end = skip
+            for offset, record in enumerate(records):
+                if offset < skip or any(s <= offset < e for s, e in written):
+                    continue
+                end = offset + 1
+                try:
+                    element = self._build(record)
+                except (ThunderdomeException, ValueError, TypeError) as err:
+                    self._invalid(record, err)
+                    continue
+                element_kind = Edge if isinstance(element, Edge) else Vertex
+                if batch and element_kind is not kind:
+                    self._flush(kind, batch, start, offset)
+                    batch = []
+                    start = offset
+                kind = element_kind
+                batch.append(element)
+                if len(batch) >= self.batch_size:
+                    self._flush(kind, batch, start, end)
+                    batch = []
+                    start = end
+            if batch:
+                self._flush(kind, batch, start, end)
+            self._drain(0)
+        finally:
+            self._pool.terminate()
+        self._report()
+        return self.stats
+
+    def _build(self, record):
+        """
+        Creates the element described by a record, edge endpoints are left as
+        vids until the batch is written.
+        """
+        values = dict((k, v) for k, v in record.items() if k not in _reserved_fields)
+        klass = self.model
+        if klass is None:
+            if 'element_type' in record:
+                klass = vertex_types.get(record['element_type'])
+            elif 'label' in record:
+                klass = edge_types.get(record['label'])
+            if klass is None:
+                raise ThunderdomeException('No model registered for the record')
+        if issubclass(klass, Edge):
+            if record.get('outV') is None or record.get('inV') is None:
+                raise ThunderdomeException('Edge records need outV and inV vids')
+            return klass(record['outV'], record['inV'], **values)
+        return klass(**values)
+
+    def _flush(self, kind, batch, start, end):
+        """
+        Validates a batch and hands it to the worker pool, blocking while too
+        many batches are in flight.
+
+        :param kind: Vertex or Edge
+        :param batch: The elements of the batch
+        :type batch: list
+        :param start: The offset of the first record of the batch
+        :type start: int
+        :param end: The offset of the first record after the batch
+        :type end: int
+
+        """
+        if kind is Edge:
+            #the endpoints may be vertices still being written
+            if any(pending[0] is Vertex for pending in self._pending):
+                self._drain(0)
+            batch = self._resolve(batch)
+
+        elements = []
+        payloads = []
+        for element in batch:
+            try:
+                payloads.append(element._save_payload())
+                elements.append(element)
+            except (ThunderdomeException, ValueError, TypeError) as err:
+                self._invalid(element, err)
+
+        self._drain(self.max_pending - 1)
+        hosts = connection._hosts
+        host = hosts[self.stats['batches'] % len(hosts)] if hosts else None
+        method_name = '_save_edges' if kind is Edge else '_save_vertices'
+        result = self._pool.apply_async(_write_batch, (kind, method_name, elements, payloads, host))
+        self._pending.append((kind, elements, start, end, result))
+        self.stats['batches'] += 1
+
+    def _resolve(self, edges):
+        """
+        Replaces the endpoint vids of the given edges with eids, skipping the
+        edges whose vertices can't be found.
+        """
+        missing = set()
+        for edge in edges:
+            for vid in (edge._outV, edge._inV):
+                if vid not in self.vid_cache:
+                    missing.add(vid)
+        if missing:
+            found, _ = Vertex.all(list(missing), partial=True)
+            for vertex in found:
+                self._remember(vertex)
+
+        resolved = []
+        for edge in edges:
+            try:
+                edge._outV = self._lookup(edge._outV)
+                edge._inV = self._lookup(edge._inV)
+            except KeyError as err:
+                self._invalid(edge, ThunderdomeException('Vertex {} not found'.format(err.args[0])))
+                continue
+            resolved.append(edge)
+        return resolved
+
+    def _lookup(self, vid):
+        """
+        Returns the cached eid of a vid, raising KeyError if it isn't cached.
+        """
+        eid = self.vid_cache.pop(vid)
+        self.vid_cache[vid] = eid
+        return eid
+
+    def _remember(self, vertex):
+        """
+        Caches the eid of a vertex by vid.
+        """
+        self.vid_cache.pop(vertex.vid, None)
+        self.vid_cache[vertex.vid] = vertex.eid
+        if len(self.vid_cache) > self.vid_cache_size:
+            self.vid_cache.popitem(last=False)
+
+    def _drain(self, limit):
+        """
+        Waits for the oldest batches until no more than `limit` are in flight,
+        checkpointing after each one. If a batch fails the batches after it
+        are still waited for so the ones that commit are checkpointed.
+        """
+        while len(self._pending) > limit:
+            pending = self._pending.popleft()
+            try:
+                pending[-1].get()
+            except Exception:
+                while self._pending:
+                    later = self._pending.popleft()
+                    if self._succeeded(later[-1]):
+                        self._commit(*later[:-1])
+                raise
+            self._commit(*pending[:-1])
+            if time.time() - self._reported >= self.report_interval:
+                self._report()
+
+    @staticmethod
+    def _succeeded(result):
+        """
+        Waits for a batch write, returning whether it succeeded.
+        """
+        try:
+            result.get()
+        except Exception:
+            return False
+        return True
+
+    def _commit(self, kind, elements, start, end):
+        """
+        Records a written batch and checkpoints the load.
+        """
+        if kind is Vertex:
+            for vertex in elements:
+                self._remember(vertex)
+            self.stats['vertices'] += len(elements)
+        else:
+            self.stats['edges'] += len(elements)
+        self._committed.append((start, end))
+        self._write_checkpoint()
+
+    def _invalid(self, item, err):
+        """
+        Records an invalid record or element, raising if the load is strict.
+        """
+        if self.strict:
+            raise err
+        self.stats['invalid'] += 1
+        logger.warning('Skipping invalid record {!r}: {}'.format(item, err))
+
+    def _report(self):
+        """
+        Logs the load throughput.
+        """
+        self._reported = time.time()
+        elapsed = self._reported - self._started
+        written = self.stats['vertices'] + self.stats['edges']
+        self.stats['elapsed'] = elapsed
+        self.stats['rate'] = written / elapsed if elapsed else 0.0
+        logger.info('{vertices} vertices, {edges} edges, {invalid} invalid records '
+                    'loaded in {elapsed:.1f}s ({rate:.0f} elements/s)'.format(**self.stats))
+
+    def _read_checkpoint(self):
+        """
+        Returns the offset before which every record was written and the
+        ranges of the records written after it, stored in the checkpoint file.
+        """
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return 0, []
+        with open(self.checkpoint) as f:
+            checkpoint = json.load(f)
+        return checkpoint['offset'], [tuple(r) for r in checkpoint.get('committed', [])]
+
+    def _write_checkpoint(self):
+        """
+        Folds the committed ranges following the offset into it, merges the
+        remaining adjacent ranges and stores them with the offset.
+        """
+        offset = self.stats['offset']
+        committed = []
+        for start, end in sorted(self._committed):
+            if start <= offset:
+                offset = max(offset, end)
+            elif committed and start <= committed[-1][1]:
+                committed[-1] = (committed[-1][0], max(committed[-1][1], end))
+            else:
+                committed.append((start, end))
+        self.stats['offset'] = offset
+        self._committed = committed
+        if self.checkpoint is None:
+            return
+        tmp = '{}.tmp'.format(self.checkpoint)
+        with open(tmp, 'w') as f:
+            json.dump({'offset': offset, 'committed': committed}, f)
+        os.rename(tmp, self.checkpoint)
+
+
+def _import_model(path):
+    """
+    Imports a model class from its dotted path.
+    """
+    module, _, name = path.rpartition('.')
+    return getattr(importlib.import_module(module), name)
+
+
+def main(argv=None):
+    """
+    Command line entry point of the bulk loader.
+    """
+    parser = argparse.ArgumentParser(description='Bulk load JSONL or CSV records into the graph')
+    parser.add_argument('input', help="File to load, '-' for stdin")
+    parser.add_argument('--graph', required=True, help='Name of the graph to load into')
+    parser.add_argument('--host', action='append', dest='hosts', help='Rexster host[:port], can be repeated')
+    parser.add_argument('--models', action='append', default=[], help='Module defining the models, can be repeated')
+    parser.add_argument('--model', help='Dotted path of the model of all the records')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='Defaults to the input file extension')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-pending', type=int)
+    parser.add_argument('--checkpoint', help='File the progress is stored in to resume interrupted loads')
+    parser.add_argument('--strict', action='store_true', help='Abort on invalid records')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    for module in args.models:
+        importlib.import_module(module)
+    model = _import_model(args.model) if args.model else None
+    format = args.format or ('csv' if args.input.endswith('.csv') else 'jsonl')
+
+    connection.setup(args.hosts or ['localhost'], args.graph)
+    loader = BulkLoader(model=model,
+                        batch_size=args.batch_size,
+                        workers=args.workers,
+                        max_pending=args.max_pending,
+                        checkpoint=args.checkpoint,
+                        strict=args.strict)
+    stream = sys.stdin if args.input == '-' else open(args.input)
+    try:
+        loader.load(read_records(stream, format))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from collections import OrderedDict
+import threading
+import time
+import weakref
+
+
+#all caches created, so elements can be invalidated everywhere they're cached
+_caches = weakref.WeakSet()
+
+
+def element_tag(eid):
+    """
+    Returns the tag used for cache entries referencing the element with the
+    given eid.
+
+    :param eid: The element's Titan-specific id
+    :type eid: int
+    :rtype: str
+
+    """
+    return 'eid:{}'.format(eid)
+
+
+def vid_tag(vid):
+    """
+    Returns the tag used for cache entries referencing the vertex with the
+    given vid.
+
+    :param vid: The thunderdome assigned UUID
+    :type vid: str
+    :rtype: str
+
+    """
+    return 'vid:{}'.format(vid)
+
+
+def invalidate_tag(tag):
+    """
+    Removes every entry with the given tag from all caches.
+
+    :param tag: The tag to invalidate
+    :type tag: str
+
+    """
+    for cache in list(_caches):
+        cache.invalidate(tag)
+
+
+def invalidate_element(eid):
+    """
+    Removes every cached entry referencing the element with the given eid
+    from all caches.
+
+    :param eid: The element's Titan-specific id
+    :type eid: int
+
+    """
+    if eid is None:
+        return
+    invalidate_tag(element_tag(eid))
+
+
+def invalidate_vid(vid):
+    """
+    Removes every cached entry referencing the vertex with the given vid from
+    all caches.
+
+    :param vid: The thunderdome assigned UUID
+    :type vid: str
+
+    """
+    if vid is None:
+        return
+    invalidate_tag(vid_tag(vid))
+
+
+class BaseCache(object):
+    """
+    Base class for cache backends. Entries are stored under a string key along
+    with a list of tags, which can be used to invalidate groups of entries.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _caches.add(self)
+
+    def get(self, key):
+        """
+        Returns the value cached under the given key, raising a KeyError if
+        there isn't one.
+
+        :param key: The cache key
+        :type key: str
+
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, tags=()):
+        """
+        Caches the value under the given key.
+
+        :param key: The cache key
+        :type key: str
+        :param value: The value to be cached
+        :type value: mixed
+        :param tags: Tags the entry can be invalidated by
+        :type tags: list of str
+
+        """
+        raise NotImplementedError
+
+    def invalidate(self, tag):
+        """
+        Removes all entries with the given tag.
+
+        :param tag: The tag to invalidate
+        :type tag: str
+
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """Removes all entries."""
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    @property
+    def hit_rate(self):
+        """
+        The fraction of lookups that were hits.
+
+        :rtype: float
+
+        """
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def stats(self):
+        """
+        Returns the hit, miss and eviction counts, hit rate and current size of
+        this cache.
+
+        :rtype: dict
+
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+            'size': len(self),
+        }
+
+
+class TTLCache(BaseCache):
+    """
+    In-process LRU cache whose entries expire after a fixed number of seconds
+    """
+
+    def __init__(self, ttl=30, maxsize=10000):
+        """
+        :param ttl: Number of seconds entries are kept for
+        :type ttl: int or float
+        :param maxsize: Maximum number of entries, the least recently used
+        entry is evicted once this is exceeded
+        :type maxsize: int
+
+        """
+        super(TTLCache, self).__init__()
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value, tags = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                raise
+            if expires < time.time():
+                self._untag(key, tags)
+                self.misses += 1
+                raise KeyError(key)
+            self._entries[key] = (expires, value, tags)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, tags=()):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tag):
+        with self._lock:
+            for key in self._tags.pop(tag, ()):
+                if key in self._entries:
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        expires, value, tags = self._entries.pop(key)
+        self._untag(key, tags)
+
+    def _untag(self, key, tags):
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -21,6 +21,7 @@ from collections import namedtuple
 import httplib
 import json
 import logging
+from multiprocessing.pool import ThreadPool
 import Queue
 import random
 import re
@@ -180,7 +181,31 @@ def setup(hosts, graph_name, username=None, password=None, index_all_fields=Fals
         klass._create_indices()
     
     
-def execute_query(query, params={}, transaction=True, context=""):
+def statsd_enabled():
+    """
+    Returns True if metrics are reported to statsd.
+
+    :rtype: boolean
+
+    """
+    return _statsd is not None
+
+
+def incr_counter(name, count=1):
+    """
+    Increments the given statsd counter, if statsd is configured.
+
+    :param name: The name of the counter
+    :type name: str
+    :param count: The amount to increment the counter by
+    :type count: int
+
+    """
+    if _statsd:
+        _statsd.incr(name, count)
+
+
+def execute_query(query, params={}, transaction=True, context="", host=None):
     """
     Execute a raw Gremlin query with the given parameters passed in.
 
@@ -189,6 +214,8 @@ def execute_query(query, params={}, transaction=True, context=""):
     :param params: Parameters to the Gremlin query
     :type params: dict
     :param context: String context data to include with the query for stats logging
+    :param host: The host to send the query to, defaults to the first host
+    :type host: Host
     :rtype: dict
     
     """
@@ -199,7 +226,7 @@ def execute_query(query, params={}, transaction=True, context=""):
     if len(_hosts) <= 0:
         raise ThunderdomeConnectionError('Attempt to execute query before calling thunderdome.connection.setup')
     
-    host = _hosts[0]
+    host = host or _hosts[0]
     #url = 'http://{}/graphs/{}/tp/gremlin'.format(host.name, _graph_name)
     data = json.dumps({'script':query, 'params': params})
     headers = {'Content-Type':'application/json', 'Accept':'application/json', 'Accept-Charset':'utf-8'}
@@ -255,6 +282,33 @@ def execute_query(query, params={}, transaction=True, context=""):
     return response_data['results'] 
 
 
+def execute_chunks(func, chunks, workers=1):
+    """
+    Calls func(chunk, host) for each of the given chunks, spreading the chunks
+    over the configured hosts and running up to `workers` of them in parallel.
+
+    :param func: The function executing a single chunk
+    :type func: callable
+    :param chunks: The chunks to execute
+    :type chunks: list
+    :param workers: The maximum number of chunks executed at once
+    :type workers: int
+    :rtype: list of the results of each chunk, in order
+
+    """
+    def execute_chunk(idx):
+        host = _hosts[idx % len(_hosts)] if _hosts else None
+        return func(chunks[idx], host)
+
+    if workers > 1 and len(chunks) > 1:
+        pool = ThreadPool(min(workers, len(chunks)))
+        try:
+            return pool.map(execute_chunk, range(len(chunks)))
+        finally:
+            pool.terminate()
+    return [execute_chunk(idx) for idx in range(len(chunks))]
+
+
 def sync_spec(filename, host, graph_name, dry_run=False):
     """
     Sync the given spec file to thunderdome.
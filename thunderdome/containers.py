@@ -17,10 +17,74 @@
 # IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-class Row(object):
-    def __init__(self, data):
-        for k,v in data.iteritems():
-            setattr(self, k, v)
+from operator import itemgetter
+
+from thunderdome.exceptions import ThunderdomeException
+
+
+class Row(tuple):
+    """
+    A single table row. Values are accessible with .notation, rows sharing the
+    same keys share a row class so rows don't carry a __dict__ of their own.
+    Columns named like a row attribute or starting with an underscore aren't
+    accessible with .notation, use _asdict() or Table.column() for those.
+    """
+    __slots__ = ()
+
+    _fields = ()
+    _index = {}
+
+    def _asdict(self):
+        """
+        Returns the row as a dictionary
+
+        :rtype: dict
+
+        """
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        return 'Row({})'.format(', '.join('{}={!r}'.format(k, v) for k, v in zip(self._fields, self)))
+
+
+#row classes keyed by their field names
+_row_types = {}
+
+
+def _row_type(fields):
+    """
+    Returns the row class for the given field names, creating it if needed.
+
+    :param fields: The keys of the row
+    :type fields: tuple
+    :rtype: type
+
+    """
+    try:
+        return _row_types[fields]
+    except KeyError:
+        attrs = {'__slots__': (), '_fields': fields, '_index': {}}
+        for idx, name in enumerate(fields):
+            attrs['_index'][name] = idx
+            #don't let columns shadow the row internals or tuple methods
+            if not name.startswith('_') and not hasattr(Row, name):
+                attrs[name] = property(itemgetter(idx))
+        row_type = _row_types[fields] = type('Row', (Row,), attrs)
+        return row_type
+
+
+def _make_row(data):
+    """
+    Builds a row from a single result dictionary.
+
+    :param data: A row of gremlin results
+    :type data: dict
+    :rtype: Row
+
+    """
+    fields = tuple(sorted(data))
+    return _row_type(fields)(data[k] for k in fields)
+
     
 class Table(object):
     """
@@ -40,36 +104,94 @@ class Table(object):
         result = Table(result)
         for i in result:
             print "{}:{}".format(i.friend_edge.nickname, i.person.name)
+
+    Single columns can be pulled out with table.column('person').
     """
     
     def __init__(self, gremlin_result):
         if gremlin_result == [[]]:
             gremlin_result = []
 
-        self._gremlin_result = gremlin_result
-        self._position = 0
-        
+        self._rows = [_make_row(r) for r in gremlin_result]
+        self._iterator = None
+
+    @classmethod
+    def _from_rows(cls, rows):
+        table = cls.__new__(cls)
+        table._rows = rows
+        table._iterator = None
+        return table
     
     def __getitem__(self, key): 
         """
-        returns an enhanced dictionary
+        returns an enhanced dictionary, or a new table if given a slice
         """
-        if key >= len(self._gremlin_result):
-            raise IndexError()
-
-        return Row(self._gremlin_result[key])
+        if isinstance(key, slice):
+            return self._from_rows(self._rows[key])
+        return self._rows[key]
         
     def __iter__(self):
-        return self
+        return iter(self._rows)
     
     def next(self):
-        if self._position == len(self._gremlin_result):
-            self._position = 0
-            raise StopIteration()
-        tmp = self._gremlin_result[self._position]
-        self._position += 1
-        return Row(tmp)
-    
+        """
+        Kept for backwards compatibility, iterate over the table instead.
+        """
+        if self._iterator is None:
+            self._iterator = iter(self._rows)
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self._iterator = None
+            raise
     
     def __len__(self):
-        return len(self._gremlin_result)
+        return len(self._rows)
+
+    def column(self, name):
+        """
+        Returns the values of the given column, None for rows without it.
+
+        :param name: The column name
+        :type name: str
+        :rtype: list
+
+        """
+        row_types = set(type(row) for row in self._rows)
+        if len(row_types) == 1:
+            row_type = row_types.pop()
+            if name in row_type._index:
+                return map(itemgetter(row_type._index[name]), self._rows)
+        return [row[row._index[name]] if name in row._index else None for row in self._rows]
+
+    def select(self, *names):
+        """
+        Returns a new table containing only the given columns.
+
+        :param names: The column names
+        :type names: str
+        :rtype: Table
+
+        """
+        columns = [self.column(name) for name in names]
+        row_type = _row_type(tuple(names))
+        return self._from_rows([row_type(values) for values in zip(*columns)])
+
+    def to_numpy(self, *names):
+        """
+        Exports the given columns, or all of them, as a numpy record array.
+
+        :param names: The column names
+        :type names: str
+        :rtype: numpy.recarray
+
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ThunderdomeException("numpy must be installed to export tables")
+
+        if not names:
+            names = sorted(set(name for row in self._rows for name in row._fields))
+        arrays = [numpy.asarray(self.column(name)) for name in names]
+        return numpy.rec.fromarrays(arrays, names=[str(name) for name in names])
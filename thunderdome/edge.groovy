@@ -1,5 +1,5 @@
 
-def _save_edge(eid, outV, inV, label, attrs, exclusive) {
+def _save_edge(eid, outV, inV, label, attrs, exclusive, fields) {
 	/**
 	 * Saves an edge between two vertices
 	 * 
@@ -8,6 +8,8 @@ def _save_edge(eid, outV, inV, label, attrs, exclusive) {
 	 * :param outV: edge outv id
 	 * :param attrs: map of parameters to set on the edge
 	 * :param exclusive: if true, this will check for an existing edge of the same label and modify it, instead of creating another edge
+	 * :param fields: list of properties whose saved values are returned
+	 * :returns: a map of the edge id under _id and the requested properties
 	 */
 	try{
 		try {
@@ -28,7 +30,11 @@ def _save_edge(eid, outV, inV, label, attrs, exclusive) {
             }
 		}
 		g.stopTransaction(SUCCESS)
-		return g.getEdge(e.id)
+		def result = ['_id': e.id]
+		for (field in fields) {
+			result[field] = e.getProperty(field)
+		}
+		return result
 	} catch (err) {
 		g.stopTransaction(FAILURE)
 		throw(err)
@@ -36,6 +42,65 @@ def _save_edge(eid, outV, inV, label, attrs, exclusive) {
 }
 
 
+def _save_edges(edges) {
+    /**
+     * Saves a list of edges in a single transaction
+     *
+     * :param edges: list of maps with the eid (null for new edges), outV, inV,
+     * label, attrs and exclusive values of each edge, as passed to _save_edge
+     * :returns: the eids of the saved edges, in order
+     */
+    try {
+        saved = edges.collect{ item ->
+            def e = item.eid == null ? null : g.e(item.eid)
+            if (e == null) {
+                def existing = []
+                if (item.exclusive) {
+                    existing = g.v(item.outV).outE(item.label).as('edge').inV().retain([g.v(item.inV)]).back('edge').toList()
+                }
+                e = existing.size() > 0 ? existing.first() : g.addEdge(g.v(item.outV), g.v(item.inV), item.label)
+            }
+            for (attr in item.attrs.entrySet()) {
+                if (attr.value == null) {
+                    e.removeProperty(attr.key)
+                } else {
+                    e.setProperty(attr.key, attr.value)
+                }
+            }
+            e
+        }
+        g.stopTransaction(SUCCESS)
+        return saved.collect{it.id}
+    } catch (err) {
+        g.stopTransaction(FAILURE)
+        throw(err)
+    }
+}
+
+def _delete_edges(eids) {
+    /**
+     * Deletes a list of edges in a single transaction
+     *
+     * :param eids: the eids of the edges to delete, missing ones are skipped
+     * :returns: the [outV eid, inV eid] pair of each edge deleted
+     */
+    try {
+        deleted = []
+        for (eid in eids) {
+            def e = g.e(eid)
+            if (e != null) {
+                deleted << [e.getVertex(Direction.OUT).id, e.getVertex(Direction.IN).id]
+                g.removeEdge(e)
+            }
+        }
+        g.stopTransaction(SUCCESS)
+        return deleted
+    } catch (err) {
+        g.stopTransaction(FAILURE)
+        throw(err)
+    }
+}
+
 def _get_edges_between(out_v, in_v, label, page_num, per_page) {
   try {
     results = g.v(out_v).outE(label).as('e').inV().retain([g.v(in_v)]).back('e')
@@ -1,17 +1,136 @@
+from datetime import datetime
+from decimal import Decimal as _Decimal
+import copy
 import inspect
+import json
 import os.path
+import threading
 import time
 import logging
+from multiprocessing.pool import ThreadPool
+from uuid import UUID as _UUID
 
-from thunderdome.connection import execute_query, ThunderdomeQueryError
+from thunderdome.cache import element_tag
+from thunderdome.connection import execute_query, execute_chunks, ThunderdomeQueryError
 from thunderdome.exceptions import ThunderdomeException
 from thunderdome.groovy import parse
+from thunderdome.properties import DateTime, Decimal, UUID
 from containers import Table
 
 
 logger = logging.getLogger(__name__)
 
 
+#guards the lazy setup of gremlin methods
+_setup_lock = threading.RLock()
+
+#map of python types to functions converting them into values rexster understands
+_param_converters = {}
+#per-type lookup cache, None marks types that pass through untouched
+_param_converter_cache = {}
+
+
+def register_param_converter(python_type, converter):
+    """
+    Registers a function used to translate values of the given type (and its
+    subclasses) into gremlin method parameters.
+
+    :param python_type: The type of value being converted
+    :type python_type: type
+    :param converter: Callable taking the value and returning the database value
+    :type converter: callable
+
+    """
+    _param_converters[python_type] = converter
+    _param_converter_cache.clear()
+
+
+def _get_param_converter(value_type):
+    """
+    Returns the converter registered for the given type or its closest base
+    class, or None if values of this type are sent as is.
+
+    :param value_type: The type of the value being converted
+    :type value_type: type
+    :rtype: callable or None
+
+    """
+    try:
+        return _param_converter_cache[value_type]
+    except KeyError:
+        converter = None
+        for klass in inspect.getmro(value_type):
+            if klass in _param_converters:
+                converter = _param_converters[klass]
+                break
+        _param_converter_cache[value_type] = converter
+        return converter
+
+
+def _transform_param(value):
+    """
+    Translates a single parameter value into one appropriate for sending over
+    Rexster.
+
+    :param value: The value to be translated
+    :type value: mixed
+
+    """
+    converter = _get_param_converter(type(value))
+    if converter is None:
+        return value
+    return converter(value)
+
+
+def _transform_list(values):
+    """
+    Translates the items of a list, the list itself is returned if none of
+    its items need converting.
+    """
+    converted = None
+    for idx, value in enumerate(values):
+        converter = _get_param_converter(type(value))
+        if converter is None:
+            continue
+        new_value = converter(value)
+        if new_value is value:
+            continue
+        if converted is None:
+            converted = list(values)
+        converted[idx] = new_value
+    return values if converted is None else converted
+
+
+def _transform_dict(values):
+    """
+    Translates the values of a dict, the dict itself is returned if none of
+    its values need converting.
+    """
+    converted = None
+    for key, value in values.iteritems():
+        converter = _get_param_converter(type(value))
+        if converter is None:
+            continue
+        new_value = converter(value)
+        if new_value is value:
+            continue
+        if converted is None:
+            converted = values.copy()
+        converted[key] = new_value
+    return values if converted is None else converted
+
+
+_datetime_column = DateTime()
+_decimal_column = Decimal()
+_uuid_column = UUID()
+
+register_param_converter(list, _transform_list)
+register_param_converter(dict, _transform_dict)
+register_param_converter(datetime, _datetime_column.to_database)
+register_param_converter(_Decimal, _decimal_column.to_database)
+register_param_converter(_UUID, _uuid_column.to_database)
+
+
 class ThunderdomeGremlinException(ThunderdomeException):
     """
     Exception thrown when a Gremlin error is encountered
@@ -27,7 +146,8 @@ class BaseGremlinMethod(object):
                  classmethod=False,
                  property=False,
                  defaults={},
-                 transaction=True):
+                 transaction=True,
+                 cache=None):
         """
         Initialize the gremlin method and define how it is attached to class.
 
@@ -45,6 +165,9 @@ class BaseGremlinMethod(object):
         :param transaction: Close previous transaction before executing (True
         by default)
         :type transaction: boolean
+        :param cache: Cache the raw results are stored in, keyed by the method
+        and its parameters. Only use this with read-only methods.
+        :type cache: thunderdome.cache.BaseCache
 
         """
         self.is_configured = False
@@ -55,11 +178,13 @@ class BaseGremlinMethod(object):
         self.property = property
         self.defaults =defaults
         self.transaction = transaction
+        self.cache = cache
 
         self.attr_name = None
         self.arg_list = []
         self.function_body = None
         self.function_def = None
+        self._contexts = {}
 
         #configuring attributes
         self.parent_class = None
@@ -90,7 +215,12 @@ class BaseGremlinMethod(object):
         Does the actual method configuration, this is here because the
         method configuration must happen after the class is defined
         """
-        if not self.is_setup:
+        if self.is_setup:
+            return
+        #methods are set up on first call, which can happen on several threads at once
+        with _setup_lock:
+            if self.is_setup:
+                return
 
             #construct the default name
             name_func = getattr(self.parent_class, 'get_element_type', None) or getattr(self.parent_class, 'get_label', None)
@@ -121,38 +251,61 @@ class BaseGremlinMethod(object):
 
             self.function_body = gremlin_obj.body
             self.function_def = gremlin_obj.defn
+            self._cache_tag = 'method:{}:{}'.format(self.path, self.method_name)
+
+            #script running the function for every parameter set in _batch_params,
+            #each call's results are listed the way rexster lists a single call's results
+            batch_args = ', '.join("_p['{}']".format(arg) for arg in self.arg_list)
+            self._batch_script = '\n'.join([
+                self.function_def,
+                '_batch_params.collect{ _p ->',
+                '    def _r = {}({})'.format(self.method_name, batch_args),
+                '    (_r instanceof Iterator || _r instanceof Iterable) ? _r.toList() : [_r]',
+                '}',
+            ])
+
+            #precompute what's needed to bind call arguments to gremlin params
+            self._arg_positions = dict((arg, idx) for idx, arg in enumerate(self.arg_list))
+            self._static_defaults = {}
+            self._callable_defaults = []
+            for k,v in self.defaults.items():
+                if callable(v):
+                    self._callable_defaults.append((k, v))
+                else:
+                    self._static_defaults[k] = v
+
             self.is_setup = True
 
-    def __call__(self, instance, *args, **kwargs):
+    def _bind_params(self, instance, args, kwargs):
         """
-        Intercept attempts to call the GremlinMethod attribute and perform a
-        gremlin query returning the results.
+        Binds the positional and keyword arguments of a call to the gremlin
+        function arguments, filling in any defaults.
 
         :param instance: The class instance the method was called on
         :type instance: object
+        :param args: The positional arguments of the call
+        :type args: tuple
+        :param kwargs: The keyword arguments of the call
+        :type kwargs: dict
+        :rtype: dict
 
         """
-        self._setup()
-
-        args = list(args)
         if not self.classmethod:
-            args = [instance.eid] + args
+            args = (instance.eid,) + args
 
-        params = self.defaults.copy()
-        if len(args + kwargs.values()) > len(self.arg_list):
-            raise TypeError('{}() takes {} args, {} given'.format(self.attr_name, len(self.arg_list), len(args)))
+        num_args = len(args)
+        if num_args + len(kwargs) > len(self.arg_list):
+            raise TypeError('{}() takes {} args, {} given'.format(self.attr_name, len(self.arg_list), num_args))
 
-        #check for and calculate callable defaults
-        for k,v in params.items():
-            if callable(v):
-                params[k] = v()
+        params = self._static_defaults.copy()
+        for k,v in self._callable_defaults:
+            params[k] = v()
 
-        arglist = self.arg_list[:]
-        for arg in args:
-            params[arglist.pop(0)] = arg
+        params.update(zip(self.arg_list, args))
 
-        for k,v in kwargs.items():
-            if k not in arglist:
+        for k,v in kwargs.iteritems():
+            position = self._arg_positions.get(k)
+            if position is None or position < num_args:
                 an = self.attr_name
                 if k in params:
                     raise TypeError(
@@ -160,15 +313,24 @@ class BaseGremlinMethod(object):
                 else:
                     raise TypeError(
                         "{}() got an unexpected keyword argument '{}'".format(an, k))
-            arglist.pop(arglist.index(k))
             params[k] = v
 
-        params = self.transform_params_to_database(params)
+        return params
+
+    def _get_context(self, instance):
+        """
+        Returns the statsd context string for calls made on the given instance,
+        these are computed once per class.
+
+        :param instance: The class instance the method was called on
+        :type instance: object
+        :rtype: str
 
+        """
+        klass = instance if self.classmethod else type(instance)
         try:
-            from thunderdome import Vertex
-            from thunderdome import Edge
-            
+            return self._contexts[klass]
+        except KeyError:
             if hasattr(instance, 'get_element_type'):
                 context = "vertices.{}".format(instance.get_element_type())
             elif hasattr(instance, 'get_label'):
@@ -177,18 +339,165 @@ class BaseGremlinMethod(object):
                 context = "other"
 
             context = "{}.{}".format(context, self.method_name)
+            self._contexts[klass] = context
+            return context
+
+    def __call__(self, instance, *args, **kwargs):
+        """
+        Intercept attempts to call the GremlinMethod attribute and perform a
+        gremlin query returning the results.
+
+        :param instance: The class instance the method was called on
+        :type instance: object
+
+        """
+        return self.execute_on(None, instance, *args, **kwargs)
+
+    def execute_on(self, host, instance, *args, **kwargs):
+        """
+        Performs the gremlin query on the given host instead of the first
+        configured one, returning the results.
+
+        :param host: The host to execute the query on, None for the default
+        :type host: thunderdome.connection.Host
+        :param instance: The class instance the method was called on
+        :type instance: object
+
+        """
+        self._setup()
+        return self._process_results(self._execute(instance, self._bind_params(instance, args, kwargs), host=host))
 
-            tmp = execute_query(self.function_body, params, transaction=self.transaction, context=context)
+    def _process_results(self, results):
+        """
+        Converts the raw results of a call into the value returned to the
+        caller.
+
+        :param results: The raw result returned from rexster
+        :type results: object
+
+        """
+        return results
+
+    def _execute(self, instance, params, host=None):
+        """
+        Executes the gremlin function with the given bound parameters,
+        returning the raw results.
+
+        :param instance: The class instance the method was called on
+        :type instance: object
+        :param params: The bound parameters of the call
+        :type params: dict
+        :param host: The host to execute the function on, defaults to the
+        first configured host
+        :type host: thunderdome.connection.Host
+
+        """
+        params = self.transform_params_to_database(params)
+        context = self._get_context(instance)
+
+        if self.cache is not None:
+            cache_key = '{}:{}'.format(self._cache_tag, json.dumps(params, sort_keys=True))
+            try:
+                return copy.deepcopy(self.cache.get(cache_key))
+            except KeyError:
+                pass
+
+        tmp = self._execute_script(self.function_body, params, context, host=host)
+
+        if self.cache is not None:
+            tags = [self._cache_tag] + [element_tag(eid) for eid in _result_eids(tmp)]
+            if not self.classmethod:
+                tags.append(element_tag(instance.eid))
+            # results are copied both ways, callers own what they get back
+            self.cache.set(cache_key, copy.deepcopy(tmp), tags)
+        return tmp
+
+    def _execute_script(self, script, params, context, host=None):
+        """
+        Executes the given script, raising a ThunderdomeGremlinException
+        describing the method if the query fails.
+
+        :param script: The gremlin script to execute
+        :type script: str
+        :param params: The transformed parameters of the script
+        :type params: dict
+        :param context: The statsd context of the call
+        :type context: str
+        :param host: The host to execute the script on, defaults to the first
+        configured host
+        :type host: thunderdome.connection.Host
+
+        """
+        try:
+            return execute_query(script, params, transaction=self.transaction, context=context, host=host)
         except ThunderdomeQueryError as tqe:
             import pprint
             msg  = "Error while executing Gremlin method\n\n"
             msg += "[Method]\n{}\n\n".format(self.method_name)
             msg += "[Params]\n{}\n\n".format(pprint.pformat(params))
-            msg += "[Function Body]\n{}\n".format(self.function_body)
+            msg += "[Function Body]\n{}\n".format(script)
             msg += "\n[Error]\n{}\n".format(tqe)
             msg += "\n[Raw Response]\n{}\n".format(tqe.raw_response)
             raise ThunderdomeGremlinException(msg)
-        return tmp
+
+    def map(self, items, chunk_size=100, workers=1, **kwargs):
+        """
+        Calls the method once for each of the given items in batches, running
+        the function for every item of a batch server side in a single
+        script. Results are returned in the same order as the items.
+
+        :param items: Element instances for instance methods, optionally paired
+        with a dict of keyword arguments as (instance, kwargs) tuples, or
+        dicts of keyword arguments for classmethods
+        :type items: list
+        :param chunk_size: The maximum number of calls sent in one script
+        :type chunk_size: int
+        :param workers: The number of batches executed in parallel, batches
+        are spread across the configured hosts
+        :type workers: int
+        :param kwargs: Keyword arguments passed to every call
+        :rtype: list
+
+        """
+        self._setup()
+
+        bound = []
+        context_instance = self.parent_class
+        for item in items:
+            if isinstance(item, dict):
+                if not self.classmethod:
+                    raise TypeError('{}.map() takes instances or (instance, kwargs) tuples'.format(self.attr_name))
+                instance, item_kwargs = self.parent_class, item
+            elif self.classmethod:
+                raise TypeError('{}.map() takes dicts of keyword arguments'.format(self.attr_name))
+            elif isinstance(item, tuple):
+                instance, item_kwargs = item
+            else:
+                instance, item_kwargs = item, {}
+            context_instance = instance
+            bound.append(self.transform_params_to_database(
+                self._bind_params(instance, (), dict(kwargs, **item_kwargs))))
+
+        if not bound:
+            return []
+
+        context = '{}.map'.format(self._get_context(context_instance))
+        chunks = [bound[i:i + chunk_size] for i in range(0, len(bound), chunk_size)]
+
+        def execute_chunk(chunk, host):
+            return self._execute_script(self._batch_script, {'_batch_params': chunk}, context, host=host)
+
+        chunk_results = execute_chunks(execute_chunk, chunks, workers)
+
+        return [self._process_results(results) for chunk in chunk_results for results in chunk]
+
+    def invalidate_cache(self):
+        """
+        Removes all of this method's results from its cache.
+        """
+        if self.cache is not None:
+            self._setup()
+            self.cache.invalidate(self._cache_tag)
 
     def transform_params_to_database(self, params):
         """
@@ -199,35 +508,121 @@ class BaseGremlinMethod(object):
         :type params: dict
 
         """
-        import inspect
-        from datetime import datetime
-        from decimal import Decimal as _Decimal
-        from uuid import UUID as _UUID
-        from thunderdome.models import BaseElement, Edge, Vertex
-        from thunderdome.properties import DateTime, Decimal, UUID
-
-        if isinstance(params, dict):
-            return {k:self.transform_params_to_database(v) for k,v in params.iteritems()}
-        if isinstance(params, list):
-            return [self.transform_params_to_database(x) for x in params]
-        if isinstance(params, BaseElement):
-            return params.eid
-        if inspect.isclass(params) and issubclass(params, Edge):
-            return params.label
-        if inspect.isclass(params) and issubclass(params, Vertex):
-            return params.element_type
-        if isinstance(params, datetime):
-            return DateTime().to_database(params)
-        if isinstance(params, _UUID):
-            return UUID().to_database(params)
-        if isinstance(params, _Decimal):
-            return Decimal().to_database(params)
-        return params
+        return _transform_param(params)
+
+
+def _result_eids(obj):
+    """
+    Returns the eids of all the elements found in a raw result
+
+    :param obj: The raw result returned from rexster
+    :type obj: object
+    :rtype: list
+
+    """
+    if isinstance(obj, dict):
+        if '_id' in obj and '_type' in obj:
+            return [obj['_id']]
+        return [eid for v in obj.itervalues() for eid in _result_eids(v)]
+    elif isinstance(obj, list):
+        return [eid for v in obj for eid in _result_eids(v)]
+    return []
+
+
+#the element class, imported on first use since models depends on this module
+_Element = None
+
+
+def _element_class():
+    """
+    Returns the element base class, importing it on first use
+    """
+    global _Element
+    if _Element is None:
+        from thunderdome.models import Element
+        _Element = Element
+    return _Element
+
+
+def _deserialize_element(obj):
+    """
+    Deserializes a single element returned from rexster
+
+    :param obj: The raw element json
+    :type obj: dict
+
+    """
+    return _element_class().deserialize(obj)
+
+
+def _deserialize_table(results):
+    """
+    Deserializes a list of rows, elements are only looked for one level deep
+
+    :param results: The raw result returned from rexster
+    :type results: list
+
+    """
+    rows = []
+    for row in results:
+        if isinstance(row, dict):
+            row = dict((k, _deserialize_element(v) if isinstance(v, dict) and '_id' in v and '_type' in v else v)
+                       for k,v in row.iteritems())
+        rows.append(row)
+    return rows
 
 
 class GremlinMethod(BaseGremlinMethod):
     """Gremlin method that returns a graph element"""
 
+    #whether results can be deserialized a page at a time
+    _pageable = True
+
+    def __init__(self, *args, **kwargs):
+        """
+        Accepts the same arguments as BaseGremlinMethod, as well as an optional
+        hint describing what the gremlin function returns and pagination
+        settings.
+
+        :param returns: What the gremlin function returns, an element class if
+        it returns a list of elements of that class or its subclasses, 'table'
+        if it returns rows of
+        elements and values or 'scalar' if the results should be returned
+        as is. By default results are deserialized recursively.
+        :type returns: Element or str
+        :param paginate: If True, calling the method returns a generator which
+        requests the results a page at a time, passing the range of each page
+        to the gremlin function as its `start` and `end` arguments, which
+        can't be passed by the caller
+        :type paginate: boolean
+        :param page_size: The number of results requested per page
+        :type page_size: int
+        :param prefetch: Request the next page while the current one is being
+        consumed
+        :type prefetch: boolean
+
+        """
+        returns = kwargs.pop('returns', None)
+        self.paginate = kwargs.pop('paginate', False)
+        self.page_size = kwargs.pop('page_size', 100)
+        self.prefetch = kwargs.pop('prefetch', False)
+        super(GremlinMethod, self).__init__(*args, **kwargs)
+
+        if self.paginate and not self._pageable:
+            raise ThunderdomeGremlinException('{} can\'t be paginated'.format(type(self).__name__))
+
+        is_element_class = inspect.isclass(returns) and issubclass(returns, _element_class())
+        if not (returns is None or is_element_class or returns in ('table', 'scalar')):
+            raise ThunderdomeGremlinException("returns must be an element class, 'table' or 'scalar'")
+        self.returns = returns
+
+    def _setup(self):
+        if not self.is_setup:
+            super(GremlinMethod, self)._setup()
+            if self.paginate and not ('start' in self.arg_list and 'end' in self.arg_list):
+                raise ThunderdomeGremlinException(
+                    "Paginated method '{}' must take start and end arguments".format(self.method_name))
+
     @staticmethod
     def _deserialize(obj):
         """
@@ -237,10 +632,8 @@ class GremlinMethod(BaseGremlinMethod):
         :type obj: object
 
         """
-        from thunderdome.models import Element
-
         if isinstance(obj, dict) and '_id' in obj and '_type' in obj:
-            return Element.deserialize(obj)
+            return _deserialize_element(obj)
         elif isinstance(obj, dict):
             return {k:GremlinMethod._deserialize(v) for k,v in obj.items()}
         elif isinstance(obj, list):
@@ -248,16 +641,99 @@ class GremlinMethod(BaseGremlinMethod):
         else:
             return obj
 
+    def _deserialize_results(self, results):
+        """
+        Deserializes the results of a call according to the returns hint
+
+        :param results: The raw result returned from rexster
+        :type results: object
+
+        """
+        returns = self.returns
+        if returns is None or results is None:
+            return GremlinMethod._deserialize(results)
+        if returns == 'scalar':
+            return results
+        if returns == 'table':
+            return _deserialize_table(results)
+        #rows of exactly the hinted class take the compiled deserializer,
+        #others are deserialized by their own type and must be a subclass
+        if hasattr(returns, 'get_label'):
+            type_key, type_name = '_label', returns.get_label()
+        else:
+            type_key, type_name = 'element_type', returns.get_element_type()
+        deserializer = returns._deserializer()
+        elements = []
+        for r in results:
+            if r is None:
+                elements.append(None)
+            elif r.get(type_key) == type_name:
+                elements.append(deserializer(r))
+            else:
+                element = _deserialize_element(r)
+                if not isinstance(element, returns):
+                    raise ThunderdomeGremlinException('{} returned a {} instead of a {}'.format(
+                        self.method_name, type(element).__name__, returns.__name__))
+                elements.append(element)
+        return elements
+
+    def _process_results(self, results):
+        return self._deserialize_results(results)
+
     def __call__(self, instance, *args, **kwargs):
-        results = super(GremlinMethod, self).__call__(instance, *args, **kwargs)
-        return GremlinMethod._deserialize(results)
+        if self.paginate:
+            self._setup()
+            num_args = len(args) if self.classmethod else len(args) + 1
+            passed = set(kwargs).union(self.arg_list[:num_args])
+            if 'start' in passed or 'end' in passed:
+                raise TypeError('{}() is paginated, start and end are passed for each page'.format(self.attr_name))
+            return self._iter_pages(instance, self._bind_params(instance, args, kwargs))
+        return super(GremlinMethod, self).__call__(instance, *args, **kwargs)
+
+    def _iter_pages(self, instance, params):
+        """
+        Yields the deserialized results of the method, requesting them from
+        rexster a page at a time until a short page is returned.
+
+        :param instance: The class instance the method was called on
+        :type instance: object
+        :param params: The bound parameters of the call
+        :type params: dict
+
+        """
+        page_size = self.page_size
+
+        def fetch(start):
+            return self._execute(instance, dict(params, start=start, end=start + page_size)) or []
+
+        pool = ThreadPool(1) if self.prefetch else None
+        try:
+            start = 0
+            results = fetch(start)
+            while True:
+                start += page_size
+                next_page = None
+                if pool is not None and len(results) == page_size:
+                    next_page = pool.apply_async(fetch, (start,))
+
+                for result in self._deserialize_results(results):
+                    yield result
+
+                if len(results) < page_size:
+                    return
+                results = next_page.get() if next_page is not None else fetch(start)
+        finally:
+            if pool is not None:
+                pool.terminate()
 
 
 class GremlinValue(GremlinMethod):
     """Gremlin Method that returns one value"""
 
-    def __call__(self, instance, *args, **kwargs):
-        results = super(GremlinValue, self).__call__(instance, *args, **kwargs)
+    _pageable = False
+
+    def _process_results(self, results):
+        results = super(GremlinValue, self)._process_results(results)
 
         if results is None:
             return
@@ -270,8 +746,10 @@ class GremlinValue(GremlinMethod):
 class GremlinTable(GremlinMethod):
     """Gremlin method that returns a table as its result"""
 
-    def __call__(self, instance, *args, **kwargs):
-        results = super(GremlinTable, self).__call__(instance, *args, **kwargs)
+    _pageable = False
+
+    def _process_results(self, results):
+        results = super(GremlinTable, self)._process_results(results)
         if results is None:
             return
         return Table(results)
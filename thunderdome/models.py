@@ -17,16 +17,22 @@
 # IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
+import base64
 from collections import OrderedDict
+import copy
 import inspect
+import itertools
+import json
 import re
 from uuid import UUID
 import warnings
 
 from thunderdome import properties
-from thunderdome.connection import execute_query, create_key_index, ThunderdomeQueryError
+from thunderdome.cache import element_tag, vid_tag, invalidate_element, invalidate_vid
+from thunderdome.connection import execute_query, execute_chunks, create_key_index, incr_counter, statsd_enabled, ThunderdomeQueryError
 from thunderdome.exceptions import ModelException, ValidationError, DoesNotExist, MultipleObjectsReturned, ThunderdomeException, WrongElementType
-from thunderdome.gremlin import BaseGremlinMethod, GremlinMethod
+from thunderdome.gremlin import BaseGremlinMethod, GremlinMethod, register_param_converter, _transform_param
+from thunderdome.session import current_identity_map
 
 
 #dict of node and edge types for rehydrating results
@@ -69,6 +75,24 @@ class BaseElement(object):
     # When true this will prepend the module name to the type name of the class
     __use_module_name__ = False
     __default_save_strategy__ = properties.SAVE_ALWAYS
+    # When true values are stored in a list per element instead of one value
+    # manager per column, previous values are only kept for modified columns
+    # and value managers are built when accessed through _values
+    __compact_storage__ = False
+    # When true deserialized values are converted to their python types on
+    # first access instead of when the element is built, implies compact
+    # storage
+    __lazy_conversion__ = False
+    # Bit mask of the values of a lazily converted element not converted yet
+    _pending = 0
+    # Names of the columns whose values are set server side, their saved
+    # values are read back after each save
+    __server_fields__ = ()
+    # Cache backend that lookups by vid and eid read through, see thunderdome.cache
+    __cache__ = None
+    # Cache backend remembering lookups by vid and eid that found nothing,
+    # this should have a short ttl
+    __negative_cache__ = None
     
     class DoesNotExist(DoesNotExist):
         """
@@ -94,6 +118,17 @@ class BaseElement(object):
         
         """
         self.eid = values.get('_id')
+        if self.__compact_storage__:
+            data = []
+            for name, column in self._columns.items():
+                value = values.get(name, None)
+                if value is not None:
+                    value = column.to_python(value)
+                data.append(value)
+            self._data = data
+            self._previous = _compact_previous(data)
+            return
+
         self._values = {}
         for name, column in self._columns.items():
             value = values.get(name, None)
@@ -219,6 +254,28 @@ class BaseElement(object):
                 
         return values
 
+    def _record_skipped_columns(self, context, params):
+        """
+        Reports to statsd the number of bytes not sent for the columns left out
+        of the given save params, and whether the save was skipped entirely
+        because nothing changed.
+
+        :param context: The statsd context of the save
+        :type context: str
+        :param params: The save params of this element
+        :type params: dict
+        
+        """
+        if not statsd_enabled():
+            return
+        skipped = 0
+        for name, col in self._columns.items():
+            if col.db_field_name not in params:
+                skipped += len(json.dumps(col.to_database(self._values[name].value), default=str))
+        incr_counter('{}.skipped_bytes'.format(context), skipped)
+        if not params:
+            incr_counter('{}.skipped'.format(context))
+
     @classmethod
     def translate_db_fields(cls, data):
         """
@@ -256,6 +313,105 @@ class BaseElement(object):
         self.pre_save()
         return self
 
+    def _mark_saved(self, eid):
+        """
+        Records that this element was saved with the given eid outside of
+        save, the saved values become the previous values of its columns.
+
+        :param eid: The element's Titan-specific id
+        :type eid: int
+        
+        """
+        self.eid = eid
+        for value_mngr in self._values.values():
+            value_mngr.previous_value = value_mngr.value
+
+    @classmethod
+    def _server_field_names(cls):
+        """
+        Returns the database names of the columns set server side.
+
+        :rtype: list of str
+        
+        """
+        return [cls._columns[name].db_field_name for name in cls.__server_fields__]
+
+    def _apply_save_result(self, result):
+        """
+        Updates this element in place from the result of a save, the saved
+        values become the previous values of its columns.
+
+        :param result: The eid under '_id' and the saved server side values
+        :type result: dict
+        
+        """
+        self._mark_saved(result['_id'])
+        for name in self.__server_fields__:
+            column = self._columns[name]
+            value = result.get(column.db_field_name)
+            if value is not None:
+                value = column.to_python(value)
+            value_mngr = self._values[name]
+            value_mngr.value = value
+            value_mngr.previous_value = value
+
+    @classmethod
+    def _save_chunks(cls, method_name, elements, payloads, chunk_size, host=None):
+        """
+        Saves the given elements in chunks, each chunk in one transaction, and
+        writes the returned eids back into them.
+
+        :param method_name: The name of the bulk save gremlin method, taking a
+        list of payloads and returning the saved eids in order
+        :type method_name: str
+        :param elements: The elements being saved
+        :type elements: list
+        :param payloads: The save payload of each element, see _save_payload
+        :type payloads: list
+        :param chunk_size: The number of elements saved per transaction
+        :type chunk_size: int
+        :param host: The host to save the elements on, defaults to the first
+        configured host
+        :type host: thunderdome.connection.Host
+        
+        """
+        method = cls._gremlin_methods[method_name]
+        for start in range(0, len(elements), chunk_size):
+            eids = method.execute_on(host, cls, payloads[start:start + chunk_size])
+            for element, eid in zip(elements[start:start + chunk_size], eids):
+                element._mark_saved(eid)
+                element._invalidate_cached()
+
+    @classmethod
+    def _delete_chunks(cls, method, eids, chunk_size, progress):
+        """
+        Deletes the elements with the given eids in chunks, each chunk in one
+        transaction.
+
+        :param method: The bulk delete gremlin method, taking a list of eids
+        and returning the number of elements deleted
+        :type method: GremlinMethod
+        :param eids: The eids of the elements to delete
+        :type eids: list
+        :param chunk_size: The number of elements deleted per transaction
+        :type chunk_size: int
+        :param progress: Called after each chunk with the number of eids
+        processed so far, the total number of eids and the number of elements
+        deleted so far
+        :type progress: callable
+        :rtype: int
+        
+        """
+        deleted = 0
+        for start in range(0, len(eids), chunk_size):
+            chunk = eids[start:start + chunk_size]
+            deleted += method(chunk)
+            for eid in chunk:
+                invalidate_element(eid)
+            if progress is not None:
+                progress(start + len(chunk), len(eids), deleted)
+        return deleted
+
     def pre_update(self, **values):
         """ Override this to perform pre-update validation """
         pass
@@ -277,6 +433,65 @@ class BaseElement(object):
 
         return self.save()
 
+    @classmethod
+    def _load_by_eid(cls, element_type, query, eid):
+        """
+        Returns the raw json of the element with the given eid, or None if it
+        wasn't found. Reads through the model's cache if it has one.
+
+        :param element_type: 'vertex' or 'edge'
+        :type element_type: str
+        :param query: The query loading the element
+        :type query: str
+        :param eid: The element's Titan-specific id
+        :type eid: int
+        
+        """
+        cache = cls.__cache__
+        negative_cache = cls.__negative_cache__
+        key = '{}:eid:{}'.format(element_type, eid)
+        if _cache_lookup(negative_cache, key):
+            return None
+        result = _cache_lookup(cache, key)
+        if result is not None:
+            return result
+
+        results = execute_query(query, {'eid':eid})
+        result = results[0] if results else None
+        if result is None:
+            if negative_cache is not None:
+                negative_cache.set(key, True, [element_tag(eid)])
+        elif cache is not None:
+            cache.set(key, copy.deepcopy(result), [element_tag(eid)])
+        return result
+
+    def _remember(self, element_type):
+        """
+        Adds this element to the active identity map, if any, unless another
+        instance is already registered under its eid.
+
+        :param element_type: 'vertex' or 'edge'
+        :type element_type: str
+        
+        """
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            key = identity_map.key(element_type, self.eid)
+            if identity_map.get(key) is None:
+                identity_map.add(key, self)
+
+    def _forget(self, element_type):
+        """
+        Removes this element from the active identity map, if any.
+
+        :param element_type: 'vertex' or 'edge'
+        :type element_type: str
+        
+        """
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            identity_map.remove(identity_map.key(element_type, self.eid))
+
     def _reload_values(self):
         """
         Base method for reloading an element from the database.
@@ -342,6 +557,18 @@ class ElementMetaClass(type):
         for field_name, col in column_dict.items():
             db_map[col.db_field_name] = field_name
 
+        def inherited(attr):
+            value = attrs.get(attr)
+            if value is None:
+                value = any(getattr(base, attr, False) for base in bases)
+            return value
+
+        lazy = inherited('__lazy_conversion__')
+        compact = lazy or inherited('__compact_storage__')
+        if compact:
+            attrs['__compact_storage__'] = True
+            _setup_compact_storage(name, attrs, column_dict, [k for k,v in column_definitions], lazy)
+
         #add management members to the class
         attrs['_columns'] = column_dict
         attrs['_db_map'] = db_map
@@ -364,6 +591,9 @@ class ElementMetaClass(type):
         def wrap_method(method):
             def method_wrapper(self, *args, **kwargs):
                 return method(self, *args, **kwargs)
+            method_wrapper.invalidate_cache = method.invalidate_cache
+            method_wrapper.map = method.map
+            method_wrapper.execute_on = method.execute_on
             return method_wrapper
         
         for k,v in attrs.items():
@@ -386,6 +616,69 @@ class ElementMetaClass(type):
         return klass
 
 
+def _setup_compact_storage(name, attrs, column_dict, own_columns, lazy):
+    """
+    Sets up the attributes of an element class using compact storage, column
+    properties read and write the values list directly.
+
+    :param name: The name of the class
+    :type name: str
+    :param attrs: The attributes of the class being created
+    :type attrs: dict
+    :param column_dict: The columns of the class, including inherited ones
+    :type column_dict: OrderedDict
+    :param own_columns: The names of the columns defined by the class itself
+    :type own_columns: list of str
+    :param lazy: Whether values are converted on first access
+    :type lazy: boolean
+    
+    """
+    for col_name, col in column_dict.items():
+        if col.value_manager is not properties.BaseValueManager:
+            raise ModelException("{} can't use compact storage, column {} has a custom value manager".format(name, col_name))
+
+    attrs['_column_index'] = dict((col_name, i) for i, col_name in enumerate(column_dict))
+    attrs['_values'] = property(properties.CompactValues)
+
+    def make_property(col_name, col, index):
+        _get = lambda self: self._data[index]
+        if lazy:
+            bit = 1 << index
+            def _get(self):
+                if self._pending & bit:
+                    return properties.CompactValueManager(self, col, index).value
+                return self._data[index]
+        _set = lambda self, val: properties.CompactValueManager(self, col, index).setval(val)
+        _del = lambda self: properties.CompactValueManager(self, col, index).delval()
+        if col.can_delete:
+            return property(_get, _set, _del)
+        return property(_get, _set)
+
+    for index, (col_name, col) in enumerate(column_dict.items()):
+        #inherited columns are redefined since their position may differ
+        if col_name in own_columns or col_name not in attrs:
+            attrs[col_name] = make_property(col_name, col, index)
+
+
+def _compact_previous(data):
+    """
+    Returns the initial previous values of an element using compact storage,
+    only values which can be changed in place need a copy.
+
+    :param data: The values of the element
+    :type data: list
+    :rtype: dict or None
+    
+    """
+    previous = None
+    for index, value in enumerate(data):
+        if isinstance(value, properties._mutable_types):
+            if previous is None:
+                previous = {}
+            previous[index] = copy.copy(value)
+    return previous
+
+
 class Element(BaseElement):
     __metaclass__ = ElementMetaClass
     
@@ -399,16 +692,163 @@ class Element(BaseElement):
             vertex_type = data['element_type']
             if vertex_type not in vertex_types:
                 raise ElementDefinitionException('Vertex "{}" not defined'.format(vertex_type))
-            translated_data = vertex_types[vertex_type].translate_db_fields(data)
-            return vertex_types[vertex_type](**translated_data)
+            return vertex_types[vertex_type]._deserializer()(data)
         elif dtype == 'edge':
             edge_type = data['_label']
             if edge_type not in edge_types:
                 raise ElementDefinitionException('Edge "{}" not defined'.format(edge_type))
-            translated_data = edge_types[edge_type].translate_db_fields(data)
-            return edge_types[edge_type](data['_outV'], data['_inV'], **translated_data)
+            return edge_types[edge_type]._deserializer()(data)
         else:
             raise TypeError("Can't deserialize '{}'".format(dtype))
+
+    @classmethod
+    def _deserializer(cls):
+        """
+        Returns the function used to build instances of this class from rexster
+        json, compiling it on first use.
+
+        :rtype: callable
+        
+        """
+        try:
+            return _deserializers[cls]
+        except KeyError:
+            deserializer = _deserializers[cls] = _compile_deserializer(cls)
+            return deserializer
+
+
+def _cache_lookup(cache, key):
+    """
+    Returns a copy of the value cached under the given key, or None if it
+    isn't cached or there's no cache. Elements keep references into the json
+    they're built from, so cached json is never handed out directly.
+
+    :param cache: The cache backend
+    :type cache: thunderdome.cache.BaseCache or None
+    :param key: The cache key
+    :type key: str
+    
+    """
+    if cache is None:
+        return None
+    try:
+        return copy.deepcopy(cache.get(key))
+    except KeyError:
+        return None
+
+
+#dict of element classes to their compiled deserializers
+_deserializers = {}
+
+
+def _compile_deserializer(klass):
+    """
+    Builds a function returning instances of the given element class from
+    rexster json. If an identity map is active, elements already in it are
+    returned as is and new elements are added to it.
+
+    :param klass: The element class to build the deserializer for
+    :type klass: Element
+    :rtype: callable
+    
+    """
+    build = _compile_builder(klass)
+    element_type = 'edge' if issubclass(klass, Edge) else 'vertex'
+
+    def deserialize(data):
+        identity_map = current_identity_map()
+        if identity_map is None:
+            return build(data)
+        key = identity_map.key(element_type, data.get('_id'))
+        element = identity_map.get(key)
+        if element is None:
+            element = build(data)
+            identity_map.add(key, element)
+        return element
+
+    return deserialize
+
+
+def _compile_builder(klass):
+    """
+    Builds a function creating instances of the given element class from
+    rexster json. The db field -> column mapping is resolved once here and
+    instances are built without going through __init__, unless the class
+    defines its own __init__.
+
+    :param klass: The element class to build the function for
+    :type klass: Element
+    :rtype: callable
+    
+    """
+    is_edge = issubclass(klass, Edge)
+
+    init_owner = next(base for base in inspect.getmro(klass) if '__init__' in base.__dict__)
+    if init_owner not in (BaseElement, Edge):
+        if is_edge:
+            return lambda data: klass(data['_outV'], data['_inV'], **klass.translate_db_fields(data))
+        return lambda data: klass(**klass.translate_db_fields(data))
+
+    if klass.__lazy_conversion__:
+        db_fields = [(1 << index, col.db_field_name) for index, col in enumerate(klass._columns.values())]
+
+        def deserialize_lazy(data):
+            element = klass.__new__(klass)
+            element.eid = data.get('_id')
+            if is_edge:
+                element._outV = data['_outV']
+                element._inV = data['_inV']
+            element._data = values = []
+            pending = 0
+            for bit, db_field in db_fields:
+                value = data.get(db_field)
+                if value is not None:
+                    pending |= bit
+                values.append(value)
+            element._pending = pending
+            element._previous = None
+            return element
+
+        return deserialize_lazy
+
+    if klass.__compact_storage__:
+        fields = [(col.db_field_name, col.to_python) for col in klass._columns.values()]
+
+        def deserialize_compact(data):
+            element = klass.__new__(klass)
+            element.eid = data.get('_id')
+            if is_edge:
+                element._outV = data['_outV']
+                element._inV = data['_inV']
+            element._data = values = []
+            for db_field, to_python in fields:
+                value = data.get(db_field)
+                if value is not None:
+                    value = to_python(value)
+                values.append(value)
+            element._previous = _compact_previous(values)
+            return element
+
+        return deserialize_compact
+
+    columns = [(name, col.db_field_name, col, col.value_manager, col.to_python)
+               for name, col in klass._columns.items()]
+
+    def deserialize(data):
+        element = klass.__new__(klass)
+        element.eid = data.get('_id')
+        if is_edge:
+            element._outV = data['_outV']
+            element._inV = data['_inV']
+        element._values = values = {}
+        for name, db_field, column, value_manager, to_python in columns:
+            value = data.get(db_field)
+            if value is not None:
+                value = to_python(value)
+            values[name] = value_manager(element, column, value)
+        return element
+
+    return deserialize
     
     
 class VertexMetaClass(ElementMetaClass):
@@ -444,8 +884,12 @@ class Vertex(Element):
 
     gremlin_path = 'vertex.groovy'
 
-    _save_vertex = GremlinMethod()
+    _save_vertex = GremlinMethod(returns='scalar')
+    _save_vertices = GremlinMethod(classmethod=True, returns='scalar')
+    _delete_vertices = GremlinMethod(classmethod=True, returns='scalar')
     _traversal = GremlinMethod()
+    _keyset_traversal = GremlinMethod()
+    _degrees = GremlinMethod(classmethod=True)
     _delete_related = GremlinMethod()
 
     #vertex id
@@ -478,7 +922,7 @@ class Vertex(Element):
         return cls._type_name(cls.element_type)
     
     @classmethod
-    def all(cls, vids, as_dict=False):
+    def all(cls, vids, as_dict=False, partial=False, chunk_size=500, workers=1):
         """
         Load all vertices with the given vids from the graph. By default this
         will return a list of vertices but if as_dict is True then it will
@@ -489,23 +933,31 @@ class Vertex(Element):
         :type vids: list
         :param as_dict: Toggle whether to return a dictionary or list
         :type as_dict: boolean
-        :rtype: dict or list
+        :param partial: If True, return a tuple of the vertices found and a
+        list of the vids that weren't found instead of raising an error
+        :type partial: boolean
+        :param chunk_size: The maximum number of vids looked up in one query
+        :type chunk_size: int
+        :param workers: The number of queries executed in parallel, queries
+        are spread across the configured hosts
+        :type workers: int
+        :rtype: dict or list, or a tuple of either and a list if partial
         
         """
         if not isinstance(vids, (list, tuple)):
             raise ThunderdomeQueryError("vids must be of type list or tuple")
         
         strvids = [str(v) for v in vids]
-        qs = ['vids.collect{g.V("vid", it).toList()[0]}']
-        
-        results = execute_query('\n'.join(qs), {'vids':strvids})
-        results = filter(None, results)
+        results = cls._load_by_vid(strvids, chunk_size, workers)
+        missing = [vid for vid, r in zip(strvids, results) if r is None]
         
-        if len(results) != len(vids):
+        if missing and not partial:
             raise ThunderdomeQueryError("the number of results don't match the number of vids requested")
         
         objects = []
         for r in results:
+            if r is None:
+                continue
             try:
                 objects += [Element.deserialize(r)]
             except KeyError:
@@ -514,10 +966,88 @@ class Vertex(Element):
                 ))
             
         if as_dict:
-            return {v.vid:v for v in objects}
+            objects = {v.vid:v for v in objects}
+
+        if partial:
+            return objects, missing
         
         return objects
 
+    @classmethod
+    def _query_vids(cls, strvids, chunk_size, workers):
+        """
+        Looks up the vertices with the given vids in the vid index, returning
+        their raw json in the same order with None for vids that weren't
+        found.
+
+        :param strvids: The vids to look up
+        :type strvids: list of str
+        :param chunk_size: The maximum number of vids looked up in one query
+        :type chunk_size: int
+        :param workers: The number of queries executed in parallel
+        :type workers: int
+        :rtype: list
+        
+        """
+        query = """
+        vids.collect{
+            def vertices = g.getVertices("vid", it).iterator()
+            vertices.hasNext() ? vertices.next() : null
+        }
+        """
+        def execute_chunk(chunk, host):
+            return execute_query(query, {'vids':chunk}, host=host)
+
+        chunks = [strvids[i:i + chunk_size] for i in range(0, len(strvids), chunk_size)]
+        return [r for results in execute_chunks(execute_chunk, chunks, workers) for r in results]
+
+    @classmethod
+    def _load_by_vid(cls, strvids, chunk_size=500, workers=1):
+        """
+        Returns the raw json of the vertices with the given vids, in the same
+        order, with None for vids that weren't found. Reads through the
+        model's cache if it has one.
+
+        :param strvids: The vids to load
+        :type strvids: list of str
+        :param chunk_size: The maximum number of vids looked up in one query
+        :type chunk_size: int
+        :param workers: The number of queries executed in parallel
+        :type workers: int
+        :rtype: list
+        
+        """
+        cache = cls.__cache__
+        negative_cache = cls.__negative_cache__
+        if cache is None and negative_cache is None:
+            return cls._query_vids(strvids, chunk_size, workers)
+
+        found = {}
+        missing = []
+        for vid in strvids:
+            key = 'vertex:vid:{}'.format(vid)
+            if _cache_lookup(negative_cache, key):
+                found[vid] = None
+                continue
+            result = _cache_lookup(cache, key)
+            if result is None:
+                missing.append(vid)
+            else:
+                found[vid] = result
+
+        if missing:
+            results = cls._query_vids(missing, chunk_size, workers)
+            for vid, result in zip(missing, results):
+                found[vid] = result
+                key = 'vertex:vid:{}'.format(vid)
+                if result is None:
+                    if negative_cache is not None:
+                        negative_cache.set(key, True, [vid_tag(vid)])
+                elif cache is not None:
+                    cache.set(key, copy.deepcopy(result), [element_tag(result['_id'])])
+
+        return [found[vid] for vid in strvids]
+
     def _reload_values(self):
         """
         Method for reloading the current vertex by reading its current values
@@ -566,10 +1096,10 @@ class Vertex(Element):
         :rtype: thunderdome.models.Vertex
         
         """
-        results = execute_query('g.v(eid)', {'eid':eid})
-        if not results:
+        result = cls._load_by_eid('vertex', 'g.v(eid)', eid)
+        if result is None:
             raise cls.DoesNotExist
-        return Element.deserialize(results[0])
+        return Element.deserialize(result)
     
     def save(self, *args, **kwargs):
         """
@@ -578,12 +1108,70 @@ class Vertex(Element):
         """
         super(Vertex, self).save(*args, **kwargs)
         params = self.as_save_params()
+        if self.eid is not None:
+            self._record_skipped_columns('vertices.{}.save'.format(self.get_element_type()), params)
+            if not params:
+                return self
         params['element_type'] = self.get_element_type()
-        result = self._save_vertex(params)[0]
-        self.eid = result.eid
-        for k,v in self._values.items():
-            v.previous_value = result._values[k].previous_value
-        return result
+        result = self._save_vertex(params, self._server_field_names())[0]
+        self._apply_save_result(result)
+        self._invalidate_cached()
+        self._remember('vertex')
+        return self
+
+    @classmethod
+    def save_many(cls, vertices, chunk_size=500):
+        """
+        Saves the given vertices, committing once per chunk instead of once per
+        vertex. Vertices are validated with their pre_save hooks before
+        anything is sent, and are updated in place with their eids.
+
+        :param vertices: The vertices to save, they can be of different types
+        :type vertices: list of Vertex
+        :param chunk_size: The number of vertices saved per transaction
+        :type chunk_size: int
+        :rtype: list of Vertex
+        
+        """
+        vertices = list(vertices)
+        payloads = [vertex._save_payload() for vertex in vertices]
+        cls._save_chunks('_save_vertices', vertices, payloads, chunk_size)
+        return vertices
+
+    def _save_payload(self):
+        """
+        Validates this vertex and returns the map describing it to
+        _save_vertices.
+
+        :rtype: dict
+        
+        """
+        BaseElement.save(self)
+        params = self.as_save_params()
+        params['element_type'] = self.get_element_type()
+        return {'eid': self.eid, 'attrs': params}
+
+    def _invalidate_cached(self):
+        """
+        Removes cached results referencing this vertex.
+        """
+        invalidate_element(self.eid)
+        invalidate_vid(self.vid)
+
+    @classmethod
+    def create_many(cls, values_list, chunk_size=500):
+        """
+        Creates a vertex of this type for each of the given property dicts, see
+        save_many.
+
+        :param values_list: The properties of each new vertex
+        :type values_list: list of dict
+        :param chunk_size: The number of vertices saved per transaction
+        :type chunk_size: int
+        :rtype: list of Vertex
+        
+        """
+        return cls.save_many([cls(**values) for values in values_list], chunk_size=chunk_size)
     
     def delete(self):
         """
@@ -598,13 +1186,114 @@ class Vertex(Element):
         g.stopTransaction(SUCCESS)
         """
         results = execute_query(query, {'eid': self.eid})
+        invalidate_element(self.eid)
+        self._forget('vertex')
+
+    @classmethod
+    def delete_many(cls, items, chunk_size=500, progress=None):
+        """
+        Deletes the given vertices, committing once per chunk instead of once
+        per vertex.
+
+        :param items: The vertices or vertex eids to delete
+        :type items: list
+        :param chunk_size: The number of vertices deleted per transaction
+        :type chunk_size: int
+        :param progress: Called after each chunk with the number of vertices
+        processed so far, the total number of vertices and the number of
+        vertices deleted so far
+        :type progress: callable
+        :returns: The number of vertices deleted
+        :rtype: int
         
+        """
+        items = list(items)
+        vertices = [item for item in items if isinstance(item, Vertex)]
+        eids = [getattr(item, 'eid', item) for item in items]
+        eids = [eid for eid in eids if eid is not None]
+
+        def delete_vertices(chunk):
+            #rexster wraps the scalar count in a list
+            return Vertex._delete_vertices(chunk)[0]
+
+        deleted = cls._delete_chunks(delete_vertices, eids, chunk_size, progress)
+        for vertex in vertices:
+            vertex._forget('vertex')
+        return deleted
+        
+    def degree(self, direction, *labels, **kwargs):
+        """
+        Returns the number of edges of this vertex, counted on the server
+        without loading them.
+
+        :param direction: OUT, IN or BOTH
+        :type direction: str
+        :param labels: pass in the labels to count in as positional arguments,
+        all edges are counted when left out
+        :type labels: str or BaseEdge
+        :param types: Only count edges to vertices of these types
+        :type types: list
+        :param by_label: Return a dict of counts keyed by edge label
+        :type by_label: bool
+        :rtype: int or dict
+        
+        """
+        return Vertex.degrees([self], direction, *labels, **kwargs)[self.eid]
+
+    @classmethod
+    def degrees(cls, vertices, direction, *labels, **kwargs):
+        """
+        Returns the number of edges of each of the given vertices, keyed by
+        eid. Counts are computed on the server, one query per chunk, vertices
+        that don't exist are counted as None.
+
+        :param vertices: The vertices or vertex eids to count edges of
+        :type vertices: list
+        :param direction: OUT, IN or BOTH
+        :type direction: str
+        :param labels: pass in the labels to count in as positional arguments,
+        all edges are counted when left out
+        :type labels: str or BaseEdge
+        :param types: Only count edges to vertices of these types
+        :type types: list
+        :param by_label: Return dicts of counts keyed by edge label
+        :type by_label: bool
+        :param chunk_size: The number of vertices counted per query
+        :type chunk_size: int
+        :rtype: dict
+        
+        """
+        types = kwargs.pop('types', None)
+        by_label = kwargs.pop('by_label', False)
+        chunk_size = kwargs.pop('chunk_size', 500)
+        if kwargs:
+            raise TypeError('Unexpected keyword arguments {}'.format(', '.join(sorted(kwargs))))
+        if direction not in (OUT, IN, BOTH):
+            raise ThunderdomeQueryError('Invalid direction {!r}'.format(direction))
+
+        element_types = None
+        if types is not None:
+            element_types = [t.get_element_type() for t in types]
+
+        label_strings = _label_strings(labels)
+        eids = [getattr(v, 'eid', v) for v in vertices]
+        if None in eids:
+            raise ThunderdomeException('cant count the edges of unsaved vertices')
+        degrees = {}
+        for start in range(0, len(eids), chunk_size):
+            chunk = eids[start:start + chunk_size]
+            for eid, count in Vertex._degrees(chunk, direction, label_strings, element_types, by_label):
+                degrees[eid] = count
+        return degrees
+
     def _simple_traversal(self,
                           operation,
                           labels,
                           limit=None,
                           offset=None,
-                          types=None):
+                          types=None,
+                          sort_key=None,
+                          cursor=None):
         """
         Perform simple graph database traversals with ubiquitous pagination.
 
@@ -618,19 +1307,14 @@ class Vertex(Element):
         :type max_results: int
         :param types: The list of allowed result elements
         :type types: list
+        :param sort_key: The edge property to paginate by with cursors instead
+        of offsets, see _keyset_page
+        :type sort_key: str
+        :param cursor: The cursor of the previous page
+        :type cursor: str
         
         """
-        label_strings = []
-        for label in labels:
-            if inspect.isclass(label) and issubclass(label, Edge):
-                label_string = label.get_label()
-            elif isinstance(label, Edge):
-                label_string = label.get_label()
-            elif isinstance(label, basestring):
-                label_string = label
-            else:
-                raise ThunderdomeException('traversal labels must be edge classes, instances, or strings')
-            label_strings.append(label_string)
+        label_strings = _label_strings(labels)
 
         allowed_elts = None
         if types is not None:
@@ -641,6 +1325,9 @@ class Vertex(Element):
                 elif issubclass(e, Edge):
                     allowed_elts += [e.get_label()]
 
+        if sort_key is not None or cursor is not None:
+            return self._keyset_page(operation, label_strings, limit, offset, allowed_elts, sort_key, cursor)
+
         if limit is not None and offset is not None:
             start = offset
             end = offset + limit
@@ -653,6 +1340,77 @@ class Vertex(Element):
                                end,
                                allowed_elts)
 
+    def _keyset_page(self, operation, labels, limit, offset, element_types, sort_key, cursor):
+        """
+        Returns a page of a traversal ordered by an edge sort key, starting
+        after the given cursor. The returned page's cursor resumes right after
+        its last result, it's None once the last page is reached.
+
+        :param operation: outV, outE, inV or inE
+        :type operation: str
+        :param labels: The edge labels
+        :type labels: list of str
+        :param limit: The number of results per page
+        :type limit: int
+        :param offset: Must be None, offsets can't be combined with cursors
+        :type offset: None
+        :param element_types: The allowed element types and labels
+        :type element_types: list of str
+        :param sort_key: The edge property the results are ordered by, this
+        should be the primary key of the edge labels. It can be left out when
+        a cursor is given.
+        :type sort_key: str
+        :param cursor: The cursor of the previous page
+        :type cursor: str
+        :rtype: Page
+        
+        """
+        if operation not in ('outV', 'outE', 'inV', 'inE'):
+            raise ThunderdomeQueryError('Cursor pagination is only supported by outV, outE, inV and inE')
+        if limit is None or offset is not None:
+            raise ThunderdomeQueryError('Cursor pagination takes a limit and no offset')
+
+        after = None
+        seen = []
+        if cursor is not None:
+            state = _decode_cursor(cursor)
+            sort_key, after, seen = state['sort_key'], state['after'], state['seen']
+
+        rows = self._keyset_traversal(operation, labels, sort_key, after, seen, limit, element_types)
+        page = Page(result for key, eid, result in rows)
+        if len(rows) == limit:
+            last = rows[-1][0]
+            ids = [eid for key, eid, result in rows if key == last]
+            if last == after:
+                ids = seen + ids
+            page.cursor = _encode_cursor({'sort_key': sort_key, 'after': last, 'seen': ids})
+        return page
+
+    def _edge_traversal(self, operation, labels, kwargs):
+        """
+        Perform an edge traversal, optionally attaching the vertices at both
+        ends of the returned edges.
+
+        :param operation: The operation to be performed
+        :type operation: str
+        :param labels: The edge labels to be used
+        :type labels: list of Edges or strings
+        :param kwargs: The traversal keyword arguments
+        :type kwargs: dict
+        :rtype: list of Edge
+        
+        """
+        with_vertices = kwargs.pop('with_vertices', False)
+        edges = self._simple_traversal(operation, labels, **kwargs)
+        if with_vertices:
+            for edge in edges:
+                if edge._outV == self.eid:
+                    edge._outV = self
+                if edge._inV == self.eid:
+                    edge._inV = self
+            prefetch_vertices(edges)
+        return edges
+
     def _simple_deletion(self, operation, labels):
         """
         Perform simple bulk graph deletion operation.
@@ -686,6 +1444,10 @@ class Vertex(Element):
         :type offset: int or None
         :param types: A list of allowed element types
         :type types: list
+        :param sort_key: Page with cursors ordered by this edge property
+        :type sort_key: str
+        :param cursor: The cursor of the previous page
+        :type cursor: str
         
         """
         return self._simple_traversal('outV', labels, **kwargs)
@@ -703,6 +1465,10 @@ class Vertex(Element):
         :type offset: int or None
         :param types: A list of allowed element types
         :type types: list
+        :param sort_key: Page with cursors ordered by this edge property
+        :type sort_key: str
+        :param cursor: The cursor of the previous page
+        :type cursor: str
 
         """
         return self._simple_traversal('inV', labels, **kwargs)
@@ -719,9 +1485,16 @@ class Vertex(Element):
         :type offset: int or None
         :param types: A list of allowed element types
         :type types: list
+        :param sort_key: Page with cursors ordered by this edge property
+        :type sort_key: str
+        :param cursor: The cursor of the previous page
+        :type cursor: str
+        :param with_vertices: Fetch the vertices at the other end of the edges
+        in one extra query and attach them to the edges
+        :type with_vertices: boolean
         
         """
-        return self._simple_traversal('outE', labels, **kwargs)
+        return self._edge_traversal('outE', labels, kwargs)
 
     def inE(self, *labels, **kwargs):
         """
@@ -735,9 +1508,16 @@ class Vertex(Element):
         :type offset: int or None
         :param types: A list of allowed element types
         :type types: list
+        :param sort_key: Page with cursors ordered by this edge property
+        :type sort_key: str
+        :param cursor: The cursor of the previous page
+        :type cursor: str
+        :param with_vertices: Fetch the vertices at the other end of the edges
+        in one extra query and attach them to the edges
+        :type with_vertices: boolean
         
         """
-        return self._simple_traversal('inE', labels, **kwargs)
+        return self._edge_traversal('inE', labels, kwargs)
 
     def bothE(self, *labels, **kwargs):
         """
@@ -751,9 +1531,12 @@ class Vertex(Element):
         :type offset: int or None
         :param types: A list of allowed element types
         :type types: list
+        :param with_vertices: Fetch the vertices at the other end of the edges
+        in one extra query and attach them to the edges
+        :type with_vertices: boolean
         
         """
-        return self._simple_traversal('bothE', labels, **kwargs)
+        return self._edge_traversal('bothE', labels, kwargs)
 
     def bothV(self, *labels, **kwargs):
         """
@@ -771,6 +1554,43 @@ class Vertex(Element):
         """
         return self._simple_traversal('bothV', labels, **kwargs)
 
+    def outEV(self, *labels, **kwargs):
+        """
+        Return a list of (edge, vertex) pairs of the edges with the given label
+        going out of this vertex and the vertices they go into, fetched in a
+        single traversal.
+        
+        :param labels: The edge labels to be traversed
+        :type labels: str or BaseEdge
+        :param limit: The number of the page to start returning results at
+        :type limit: int or None
+        :param offset: The maximum number of results to return
+        :type offset: int or None
+        :param types: A list of allowed vertex types
+        :type types: list
+        :rtype: list of tuple
+        
+        """
+        return [tuple(pair) for pair in self._simple_traversal('outEV', labels, **kwargs)]
+
+    def inEV(self, *labels, **kwargs):
+        """
+        Return a list of (edge, vertex) pairs of the edges with the given label
+        coming into this vertex and the vertices they come out of, fetched in a
+        single traversal.
+        
+        :param labels: The edge labels to be traversed
+        :type labels: str or BaseEdge
+        :param limit: The number of the page to start returning results at
+        :type limit: int or None
+        :param offset: The maximum number of results to return
+        :type offset: int or None
+        :param types: A list of allowed vertex types
+        :type types: list
+        :rtype: list of tuple
+        
+        """
+        return [tuple(pair) for pair in self._simple_traversal('inEV', labels, **kwargs)]
 
     def delete_outE(self, *labels):
         """Delete all outgoing edges with the given label."""
@@ -791,8 +1611,76 @@ class Vertex(Element):
     def query(self):
         return Query(self)
 
+    def traverse(self):
+        """
+        Returns a traversal builder starting from this vertex, its steps are
+        compiled into a single gremlin script executed in one query.
+
+        :rtype: Traversal
         
+        """
+        return Traversal(self)
+
         
+        
+def _label_strings(labels):
+    """
+    Returns the label strings of the given edge classes, instances or strings.
+
+    :param labels: The edge labels
+    :type labels: list of Edges or strings
+    :rtype: list of str
+    
+    """
+    label_strings = []
+    for label in labels:
+        if inspect.isclass(label) and issubclass(label, Edge):
+            label_string = label.get_label()
+        elif isinstance(label, Edge):
+            label_string = label.get_label()
+        elif isinstance(label, basestring):
+            label_string = label
+        else:
+            raise ThunderdomeException('traversal labels must be edge classes, instances, or strings')
+        label_strings.append(label_string)
+    return label_strings
+
+
+class Page(list):
+    """
+    A page of traversal results, `cursor` is passed back to the traversal to
+    get the next page and is None on the last page.
+    """
+    cursor = None
+
+
+def _encode_cursor(state):
+    """
+    Returns the opaque cursor string of a keyset pagination state.
+
+    :param state: The sort key, the key value and the ids seen with it
+    :type state: dict
+    :rtype: str
+    
+    """
+    return base64.urlsafe_b64encode(json.dumps(state))
+
+
+def _decode_cursor(cursor):
+    """
+    Returns the keyset pagination state of a cursor string.
+
+    :param cursor: A cursor returned with a page
+    :type cursor: str
+    :rtype: dict
+    
+    """
+    try:
+        return json.loads(base64.urlsafe_b64decode(str(cursor)))
+    except (TypeError, ValueError):
+        raise ThunderdomeQueryError('Invalid cursor {!r}'.format(cursor))
+
+
 def to_offset(page_num, per_page):
     """
     Convert a page_num and per_page to offset.
@@ -822,12 +1710,18 @@ class PaginatedVertex(Vertex):
         :param kwargs:
         :return:
         """
-        values = kwargs.copy()
-        return {
+        values = {
             'limit': kwargs.get('per_page'),
             'offset': to_offset(kwargs.get('page_num'), kwargs.get('per_page')),
             'types': kwargs.get('types'),
         }
+        if 'with_vertices' in kwargs:
+            values['with_vertices'] = kwargs['with_vertices']
+        if 'sort_key' in kwargs or 'cursor' in kwargs:
+            values['offset'] = None
+            values['sort_key'] = kwargs.get('sort_key')
+            values['cursor'] = kwargs.get('cursor')
+        return values
 
     __abstract__ = True
     def outV(self, *labels, **kwargs):
@@ -846,6 +1740,7 @@ class PaginatedVertex(Vertex):
         :param page_num: the page number to return
         :param per_page: the number of objects to return per page
         :param types: the element types this method is allowed to return
+        :param with_vertices: attach the vertices at the other end of the edges
         :return:
         """
         return super(PaginatedVertex, self).outE(*labels, **self._transform_kwargs(kwargs))
@@ -866,6 +1761,7 @@ class PaginatedVertex(Vertex):
         :param page_num: the page number to return
         :param per_page: the number of objects to return per page
         :param types: the element types this method is allowed to return
+        :param with_vertices: attach the vertices at the other end of the edges
         :return:
         """
         return super(PaginatedVertex, self).inE(*labels, **self._transform_kwargs(kwargs))
@@ -886,11 +1782,32 @@ class PaginatedVertex(Vertex):
         :param page_num: the page number to return
         :param per_page: the number of objects to return per page
         :param types: the element types this method is allowed to return
+        :param with_vertices: attach the vertices at the other end of the edges
         :return:
         """
         return super(PaginatedVertex, self).bothE(*labels, **self._transform_kwargs(kwargs))
-    
-    
+
+    def outEV(self, *labels, **kwargs):
+        """
+        :param labels: pass in the labels to follow in as positional arguments
+        :param page_num: the page number to return
+        :param per_page: the number of pairs to return per page
+        :param types: the vertex types this method is allowed to return
+        :return:
+        """
+        return super(PaginatedVertex, self).outEV(*labels, **self._transform_kwargs(kwargs))
+
+    def inEV(self, *labels, **kwargs):
+        """
+        :param labels: pass in the labels to follow in as positional arguments
+        :param page_num: the page number to return
+        :param per_page: the number of pairs to return per page
+        :param types: the vertex types this method is allowed to return
+        :return:
+        """
+        return super(PaginatedVertex, self).inEV(*labels, **self._transform_kwargs(kwargs))
+
+
 class EdgeMetaClass(ElementMetaClass):
     """Metaclass for edges."""
     
@@ -922,7 +1839,9 @@ class Edge(Element):
     
     gremlin_path = 'edge.groovy'
     
-    _save_edge = GremlinMethod()
+    _save_edge = GremlinMethod(returns='scalar')
+    _save_edges = GremlinMethod(classmethod=True, returns='scalar')
+    _delete_edges = GremlinMethod(classmethod=True, returns='scalar')
     _get_edges_between = GremlinMethod(classmethod=True)
     
     def __init__(self, outV, inV, **values):
@@ -991,11 +1910,88 @@ class Edge(Element):
         Save this edge to the graph database.
         """
         super(Edge, self).save(*args, **kwargs)
-        return self._save_edge(self._outV,
-                               self._inV,
-                               self.get_label(),
-                               self.as_save_params(),
-                               exclusive=self.__exclusive__)[0]
+        params = self.as_save_params()
+        if self.eid is not None:
+            self._record_skipped_columns('edges.{}.save'.format(self.get_label()), params)
+            if not params:
+                return self
+        result = self._save_edge(self._outV,
+                                 self._inV,
+                                 self.get_label(),
+                                 params,
+                                 exclusive=self.__exclusive__,
+                                 fields=self._server_field_names())[0]
+        self._apply_save_result(result)
+        self._invalidate_cached()
+        self._remember('edge')
+        return self
+
+    @classmethod
+    def save_many(cls, edges, chunk_size=500):
+        """
+        Saves the given edges, committing once per chunk instead of once per
+        edge. Edges are validated with their pre_save hooks before anything is
+        sent, and are updated in place with their eids. Unsaved vertices the
+        edges point to are saved first with Vertex.save_many, the endpoints in
+        the payloads are only converted to eids when they're sent.
+
+        :param edges: The edges to save, they can be of different types
+        :type edges: list of Edge
+        :param chunk_size: The number of edges saved per transaction
+        :type chunk_size: int
+        :rtype: list of Edge
+        
+        """
+        edges = list(edges)
+        payloads = [edge._save_payload() for edge in edges]
+        new_vertices = []
+        seen = set()
+        for edge in edges:
+            for vertex in (edge._outV, edge._inV):
+                if isinstance(vertex, Vertex) and vertex.eid is None and id(vertex) not in seen:
+                    seen.add(id(vertex))
+                    new_vertices.append(vertex)
+        if new_vertices:
+            Vertex.save_many(new_vertices, chunk_size=chunk_size)
+
+        cls._save_chunks('_save_edges', edges, payloads, chunk_size)
+        return edges
+
+    def _save_payload(self):
+        """
+        Validates this edge and returns the map describing it to _save_edges.
+
+        :rtype: dict
+        
+        """
+        BaseElement.save(self)
+        return {'eid': self.eid,
+                'outV': self._outV,
+                'inV': self._inV,
+                'label': self.get_label(),
+                'attrs': self.as_save_params(),
+                'exclusive': self.__exclusive__}
+
+    @classmethod
+    def create_many(cls, items, chunk_size=500):
+        """
+        Creates an edge of this type for each of the given (outV, inV) or
+        (outV, inV, values) tuples, see save_many. The vertices can be new
+        vertices which haven't been saved yet.
+
+        :param items: The vertices and properties of each new edge
+        :type items: list of tuple
+        :param chunk_size: The number of edges saved per transaction
+        :type chunk_size: int
+        :rtype: list of Edge
+        
+        """
+        edges = []
+        for item in items:
+            outV, inV = item[:2]
+            values = item[2] if len(item) > 2 else {}
+            edges.append(cls(outV, inV, **values))
+        return cls.save_many(edges, chunk_size=chunk_size)
 
     def _reload_values(self):
         """
@@ -1016,10 +2012,10 @@ class Edge(Element):
         :type eid: int
         
         """
-        results = execute_query('g.e(eid)', {'eid':eid})
-        if not results:
+        result = cls._load_by_eid('edge', 'g.e(eid)', eid)
+        if result is None:
             raise cls.DoesNotExist
-        return Element.deserialize(results[0])
+        return Element.deserialize(result)
 
     @classmethod
     def create(cls, outV, inV, *args, **kwargs):
@@ -1051,6 +2047,53 @@ class Edge(Element):
         }
         """        
         results = execute_query(query, {'eid':self.eid})
+        self._invalidate_cached()
+        self._forget('edge')
+
+    @classmethod
+    def delete_many(cls, items, chunk_size=500, progress=None):
+        """
+        Deletes the given edges, committing once per chunk instead of once per
+        edge. Like delete, cached entries of the edges and of the vertices
+        they connect are invalidated.
+
+        :param items: The edges or edge eids to delete
+        :type items: list
+        :param chunk_size: The number of edges deleted per transaction
+        :type chunk_size: int
+        :param progress: Called after each chunk with the number of edges
+        processed so far, the total number of edges and the number of edges
+        deleted so far
+        :type progress: callable
+        :returns: The number of edges deleted
+        :rtype: int
+        
+        """
+        items = list(items)
+        edges = [item for item in items if isinstance(item, Edge)]
+        eids = [getattr(item, 'eid', item) for item in items]
+        eids = [eid for eid in eids if eid is not None]
+
+        def delete_edges(chunk):
+            #the endpoints of bare eids are only known once they're deleted
+            endpoints = Edge._delete_edges(chunk)
+            for eid in itertools.chain.from_iterable(endpoints):
+                invalidate_element(eid)
+            return len(endpoints)
+
+        deleted = cls._delete_chunks(delete_edges, eids, chunk_size, progress)
+        for edge in edges:
+            edge._invalidate_cached()
+            edge._forget('edge')
+        return deleted
+
+    def _invalidate_cached(self):
+        """
+        Removes cached results referencing this edge or the vertices it connects.
+        """
+        invalidate_element(self.eid)
+        for vertex in (self._outV, self._inV):
+            invalidate_element(getattr(vertex, 'eid', vertex))
 
     def _simple_traversal(self, operation):
         """
@@ -1092,24 +2135,87 @@ class Edge(Element):
         return self._outV
 
 
+def prefetch_vertices(edges, direction='both'):
+    """
+    Loads the vertices at the given ends of the edges in a single query and
+    attaches them to the edges, so calling inV() or outV() on them doesn't
+    query the graph again. Ends already holding a vertex are left as is.
+
+    :param edges: The edges to fetch the vertices of
+    :type edges: list of Edge
+    :param direction: 'in', 'out' or 'both'
+    :type direction: str
+    :rtype: list of Edge
+    
+    """
+    direction = direction.lower()
+    if direction not in ('in', 'out', 'both'):
+        raise ThunderdomeException("direction must be 'in', 'out' or 'both'")
+    attrs = []
+    if direction in ('in', 'both'):
+        attrs.append('_inV')
+    if direction in ('out', 'both'):
+        attrs.append('_outV')
+
+    eids = set()
+    for edge in edges:
+        for attr in attrs:
+            eid = getattr(edge, attr)
+            if isinstance(eid, (int, long)):
+                eids.add(eid)
+    if not eids:
+        return edges
+
+    results = execute_query('eids.collect{ g.v(it) }', {'eids': list(eids)})
+    vertices = dict((r['_id'], Element.deserialize(r)) for r in results if r is not None)
+    for edge in edges:
+        for attr in attrs:
+            vertex = vertices.get(getattr(edge, attr))
+            if vertex is not None:
+                setattr(edge, attr, vertex)
+    return edges
+
+
+#elements are passed to gremlin methods by eid, and element classes by type name
+register_param_converter(BaseElement, lambda element: element.eid)
+register_param_converter(VertexMetaClass, lambda klass: klass.element_type)
+register_param_converter(EdgeMetaClass, lambda klass: klass.label)
+
+
+#rendered query scripts by query shape
+_query_scripts = {}
 
-import copy
 
 class Query(object):
     """
     All query operations return a new query object, which currently deviates from blueprints.
     The blueprints query object modifies and returns the same object
     This method seems more flexible, and consistent w/ the rest of Gremlin.
+
+    Query objects are immutable, their script text only depends on the shape
+    of the query and is memoized, values are bound as parameters.
     """
     _limit = None
 
     def __init__(self, vertex):
-        self._vertex = vertex
-        self._has = []
-        self._interval = []
-        self._labels = []
-        self._direction = []
-        self._vars = {}
+        self._init(_vertex=vertex, _has=(), _interval=(), _labels=[], _direction=[])
+
+    def _init(self, **attrs):
+        self.__dict__.update(attrs)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Query objects are immutable')
+
+    def _replace(self, **changes):
+        """
+        Returns a copy of this query with the given attributes changed.
+
+        :rtype: Query
+        """
+        q = Query.__new__(Query)
+        q._init(**self.__dict__)
+        q._init(**changes)
+        return q
 
     def count(self):
         """
@@ -1123,11 +2229,9 @@ class Query(object):
         :param direction:
         :rtype: Query
         """
-        q = copy.copy(self)
         if self._direction:
             raise ThunderdomeQueryError("Direction already set")
-        q._direction = direction
-        return q
+        return self._replace(_direction=direction)
 
     def edges(self):
         """
@@ -1143,10 +2247,7 @@ class Query(object):
         :rtype: Query
         """
         compare = "Query.Compare.{}".format(compare)
-
-        q = copy.copy(self)
-        q._has.append((key,value,compare))
-        return q
+        return self._replace(_has=self._has + ((key, value, compare),))
 
     def interval(self, key, start, end):
         """
@@ -1154,11 +2255,7 @@ class Query(object):
         """
         if start > end:
             start, end = end, start
-
-        q = copy.copy(self)
-        q._interval.append((key, start, end))
-        return q
-
+        return self._replace(_interval=self._interval + ((key, start, end),))
 
     def labels(self, *args):
         """
@@ -1171,76 +2268,105 @@ class Query(object):
                 tmp.append(x.get_label())
             except:
                 tmp.append(x)
-
-        q = copy.copy(self)
-        q._labels = tmp
-        return q
+        return self._replace(_labels=tmp)
 
     def limit(self, limit):
-        q = copy.copy(self)
-        q._limit = limit
-        return q
+        return self._replace(_limit=limit)
 
     def vertexIds(self):
         return self._execute('vertexIds', deserialize=False)
 
-    def vertices(self):
-        return self._execute('vertices')
+    def edgeIds(self):
+        """
+        :return list of matching edge ids
+        """
+        return self._execute('edges', deserialize=False, suffix='.collect{it.id}')
 
-    def _get_partial(self):
-        limit = ".limit(limit)" if self._limit else ""
-        dir = ".direction({})".format(self._direction) if self._direction else ""
+    def delete_vertices(self, chunk_size=500, progress=None):
+        """
+        Deletes the matching vertices in chunks, see Vertex.delete_many
 
-        # do labels
-        labels = ""
-        if self._labels:
-            labels = ["'{}'".format(x) for x in self._labels]
-            labels = ", ".join(labels)
-            labels = ".labels({})".format(labels)
+        :return number of vertices deleted
+        :rtype int
+        """
+        return Vertex.delete_many(self.vertexIds(), chunk_size=chunk_size, progress=progress)
 
-        ### construct has clauses
-        has = []
+    def delete_edges(self, chunk_size=500, progress=None):
+        """
+        Deletes the matching edges in chunks, see Edge.delete_many
+
+        :return number of edges deleted
+        :rtype int
+        """
+        return Edge.delete_many(self.edgeIds(), chunk_size=chunk_size, progress=progress)
+
+    def _shape(self):
+        """
+        Returns everything the script text of this query depends on, the has
+        and interval values are left out since they're bound as parameters.
+
+        :rtype: tuple
+        """
+        return (tuple(self._labels),
+                bool(self._limit),
+                self._direction or None,
+                tuple((key, isinstance(value, float), compare) for key, value, compare in self._has),
+                tuple((key, isinstance(start, float), isinstance(end, float)) for key, start, end in self._interval))
 
-        for x in self._has:
-            c = "v{}".format(len(self._vars))
-            self._vars[c] = x[1]
+    def _get_partial(self):
+        shape = self._shape()
+        try:
+            return _query_scripts[shape]
+        except KeyError:
+            pass
 
-            val = "{} as double".format(c) if isinstance(x[1], float) else c
-            key = x[0]
-            has.append("has('{}', {}, {})".format(key, val, x[2]))
+        labels, limit, direction, has_shape, interval_shape = shape
+        limit = ".limit(limit)" if limit else ""
+        dir = ".direction({})".format(direction) if direction else ""
 
-        if has:
-            tmp = ".".join(has)
-            has = '.{}'.format(tmp)
+        # do labels
+        if labels:
+            labels = ", ".join("'{}'".format(x) for x in labels)
+            labels = ".labels({})".format(labels)
         else:
-            has = ""
-        ### end construct has clauses
+            labels = ""
 
-        intervals = []
-        for x in self._interval:
-            c = "v{}".format(len(self._vars))
-            self._vars[c] = x[1]
-            c2 = "v{}".format(len(self._vars))
-            self._vars[c2] = x[2]
+        # values are named in order, has clauses first
+        names = ("v{}".format(i) for i in itertools.count())
 
+        has = []
+        for key, is_float, compare in has_shape:
+            c = next(names)
+            val = "{} as double".format(c) if is_float else c
+            has.append(".has('{}', {}, {})".format(key, val, compare))
 
-            val1 = "{} as double".format(c) if isinstance(x[1], float) else c
-            val2 = "{} as double".format(c2) if isinstance(x[2], float) else c2
+        intervals = []
+        for key, start_float, end_float in interval_shape:
+            c, c2 = next(names), next(names)
+            val1 = "{} as double".format(c) if start_float else c
+            val2 = "{} as double".format(c2) if end_float else c2
+            intervals.append(".interval('{}', {}, {})".format(key, val1, val2))
 
-            tmp = "interval('{}', {}, {})".format(x[0], val1, val2)
-            intervals.append(tmp)
+        script = "g.v(eid).query(){}{}{}{}{}".format(labels, limit, dir, "".join(has), "".join(intervals))
+        _query_scripts[shape] = script
+        return script
 
-        if intervals:
-            intervals = ".{}".format(".".join(intervals))
-        else:
-            intervals = ""
+    def _params(self):
+        """
+        Returns the parameters bound to the script of this query.
 
-        return "g.v(eid).query(){}{}{}{}{}".format(labels, limit, dir, has, intervals)
+        :rtype: dict
+        """
+        values = [value for key, value, compare in self._has]
+        for key, start, end in self._interval:
+            values += [start, end]
+        params = dict(("v{}".format(i), value) for i, value in enumerate(values))
+        params.update({"eid":self._vertex.eid, "limit":self._limit})
+        return params
 
-    def _execute(self, func, deserialize=True):
-        tmp = "{}.{}()".format(self._get_partial(), func)
-        self._vars.update({"eid":self._vertex.eid, "limit":self._limit})
-        results = execute_query(tmp, self._vars)
+    def _execute(self, func, deserialize=True, suffix=""):
+        tmp = "{}.{}(){}".format(self._get_partial(), func, suffix)
+        results = execute_query(tmp, self._params())
 
         if deserialize:
             return  [Element.deserialize(r) for r in results]
@@ -1248,7 +2374,217 @@ class Query(object):
             return results
 
 
+#gremlin tokens of the query compare operators
+_gremlin_compare = {
+    EQUAL: 'T.eq',
+    NOT_EQUAL: 'T.neq',
+    GREATER_THAN: 'T.gt',
+    GREATER_THAN_EQUAL: 'T.gte',
+    LESS_THAN: 'T.lt',
+    LESS_THAN_EQUAL: 'T.lte',
+}
+
+#compiled traversal scripts by step shape
+_traversal_scripts = {}
+
 
+class Traversal(object):
+    """
+    Multi-hop traversal builder starting from a vertex. Each step returns a
+    new traversal, and the steps are compiled into a single gremlin pipeline
+    whose text only depends on the kind of steps taken, all values are passed
+    as parameters. Compiled scripts are cached by step shape so rexster can
+    reuse its compiled version.
+    """
+
+    def __init__(self, vertex, steps=()):
+        """
+        :param vertex: The vertex the traversal starts from
+        :type vertex: Vertex
+        :param steps: The (template, values) pairs of the steps taken so far,
+        templates reference their values as {0}, {1}...
+        :type steps: tuple
+
+        """
+        self._vertex = vertex
+        self._steps = steps
+
+    def _step(self, template, *values):
+        return Traversal(self._vertex, self._steps + ((template, values),))
+
+    def out(self, *labels):
+        """
+        Follows the outgoing edges with the given labels to their vertices.
+
+        :rtype: Traversal
+        """
+        return self._step('.out(*{0})', _label_strings(labels))
+
+    def in_(self, *labels):
+        """
+        Follows the incoming edges with the given labels to their vertices.
+
+        :rtype: Traversal
+        """
+        return self._step('.in(*{0})', _label_strings(labels))
 
+    def both(self, *labels):
+        """
+        Follows the edges with the given labels in both directions to their
+        vertices.
 
+        :rtype: Traversal
+        """
+        return self._step('.both(*{0})', _label_strings(labels))
+
+    def outE(self, *labels):
+        """
+        Moves to the outgoing edges with the given labels.
+
+        :rtype: Traversal
+        """
+        return self._step('.outE(*{0})', _label_strings(labels))
+
+    def inE(self, *labels):
+        """
+        Moves to the incoming edges with the given labels.
+
+        :rtype: Traversal
+        """
+        return self._step('.inE(*{0})', _label_strings(labels))
 
+    def inV(self):
+        """
+        Moves from edges to the vertices they go into.
+
+        :rtype: Traversal
+        """
+        return self._step('.inV()')
+
+    def outV(self):
+        """
+        Moves from edges to the vertices they come out of.
+
+        :rtype: Traversal
+        """
+        return self._step('.outV()')
+
+    def has(self, key, value, compare=EQUAL):
+        """
+        Keeps the elements whose property compares to the given value.
+
+        :param key: The property name
+        :type key: str
+        :param value: The value to compare to
+        :type value: str, float, int
+        :param compare: One of the Query compare operators
+        :type compare: str
+        :rtype: Traversal
+        """
+        if compare not in _gremlin_compare:
+            raise ThunderdomeQueryError('Unknown compare operator {}'.format(compare))
+        val = '{1} as double' if isinstance(value, float) else '{1}'
+        return self._step('.has({{0}}, {}, {})'.format(_gremlin_compare[compare], val), key, value)
+
+    def types(self, *types):
+        """
+        Keeps the vertices and edges of the given element classes.
+
+        :param types: Vertex and edge classes
+        :type types: list
+        :rtype: Traversal
+        """
+        if not types:
+            raise ThunderdomeQueryError('types needs at least one element class')
+        element_types = [t.get_element_type() for t in types if issubclass(t, Vertex)]
+        labels = [t.get_label() for t in types if issubclass(t, Edge)]
+        if element_types and labels:
+            return self._step('.filter{{it.element_type in {0} || it.label in {1}}}', element_types, labels)
+        if labels:
+            return self._step('.filter{{it.label in {0}}}', labels)
+        return self._step('.filter{{it.element_type in {0}}}', element_types)
+
+    def dedup(self):
+        """
+        Removes duplicate elements.
+
+        :rtype: Traversal
+        """
+        return self._step('.dedup()')
+
+    def range(self, start, end):
+        """
+        Keeps the elements from start (inclusive) to end (exclusive).
+
+        :rtype: Traversal
+        """
+        return self._step('[{0}..<{1}]', start, end)
+
+    def limit(self, limit):
+        """
+        Keeps the first `limit` elements.
+
+        :rtype: Traversal
+        """
+        return self._step('[0..<{0}]', limit)
+
+    def order(self, key, reverse=False):
+        """
+        Sorts the elements by the given property.
+
+        :param key: The property name
+        :type key: str
+        :param reverse: Sort in descending order
+        :type reverse: boolean
+        :rtype: Traversal
+        """
+        if reverse:
+            return self._step('.order{{it.b.getProperty({0}) <=> it.a.getProperty({0})}}', key)
+        return self._step('.order{{it.a.getProperty({0}) <=> it.b.getProperty({0})}}', key)
+
+    def _compile(self, terminal):
+        """
+        Returns the script and parameters of this traversal, the parameters
+        are converted like gremlin method arguments.
+
+        :param terminal: The text appended to the pipeline
+        :type terminal: str
+        :rtype: (str, dict)
+        """
+        shape = (tuple(template for template, values in self._steps), terminal)
+        script = _traversal_scripts.get(shape)
+        if script is None:
+            parts = ['g.v(eid)']
+            count = 0
+            for template, values in self._steps:
+                names = ['p{}'.format(count + i) for i in range(len(values))]
+                count += len(values)
+                parts.append(template.format(*names))
+            parts.append(terminal)
+            script = _traversal_scripts[shape] = ''.join(parts)
+
+        params = {'eid': self._vertex.eid}
+        count = 0
+        for template, values in self._steps:
+            for value in values:
+                params['p{}'.format(count)] = value
+                count += 1
+        return script, _transform_param(params)
+
+    def all(self):
+        """
+        Runs the traversal, returning the elements reached.
+
+        :rtype: list
+        """
+        script, params = self._compile('')
+        return [Element.deserialize(r) for r in execute_query(script, params)]
+
+    def count(self):
+        """
+        Runs the traversal, returning the number of elements reached.
+
+        :rtype: int
+        """
+        script, params = self._compile('.count()')
+        return execute_query(script, params)[0]
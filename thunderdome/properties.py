@@ -131,6 +131,163 @@ class BaseValueManager(object):
             return property(_get, _set)
 
 
+#types whose values can be modified in place, previous values of these are
+#always copied so in place changes are detected
+_mutable_types = (list, dict, set)
+
+
+class CompactValueManager(object):
+    """
+    Value manager view over the values of an element using compact storage.
+    Current values are held in the element's _data list and previous values
+    in its _previous dict, which only has entries for the modified columns.
+    The bits set in the element's _pending mask mark the values which are
+    still raw database values, these are converted on first access. Value
+    managers are built on demand and don't hold any state of their own.
+    """
+    __slots__ = ('instance', 'column', 'index')
+
+    def __init__(self, instance, column, index):
+        """
+        :param instance: The element the value belongs to
+        :type instance: thunderdome.models.BaseElement
+        :param column: The column to manage
+        :type column: thunder.columns.Column
+        :param index: The position of the column in the element's values
+        :type index: int
+
+        """
+        self.instance = instance
+        self.column = column
+        self.index = index
+
+    def _convert(self):
+        """
+        Converts the value to its python type if it's still the raw database
+        value of a lazily converted element.
+        """
+        instance = self.instance
+        bit = 1 << self.index
+        if instance._pending & bit:
+            value = self.column.to_python(instance._data[self.index])
+            instance._data[self.index] = value
+            instance._pending &= ~bit
+            if isinstance(value, _mutable_types):
+                if instance._previous is None:
+                    instance._previous = {}
+                instance._previous[self.index] = copy.copy(value)
+
+    @property
+    def value(self):
+        self._convert()
+        return self.instance._data[self.index]
+
+    @value.setter
+    def value(self, val):
+        self.setval(val)
+
+    @property
+    def previous_value(self):
+        self._convert()
+        previous = self.instance._previous
+        if previous is not None and self.index in previous:
+            return previous[self.index]
+        return self.instance._data[self.index]
+
+    @previous_value.setter
+    def previous_value(self, val):
+        self._convert()
+        instance = self.instance
+        if isinstance(val, _mutable_types) or val != instance._data[self.index]:
+            if instance._previous is None:
+                instance._previous = {}
+            instance._previous[self.index] = copy.copy(val)
+        elif instance._previous:
+            instance._previous.pop(self.index, None)
+            if not instance._previous:
+                instance._previous = None
+
+    @property
+    def deleted(self):
+        """
+        Indicates whether or not this value has been deleted.
+
+        :rtype: boolean
+
+        """
+        return self.value is None and self.previous_value is not None
+
+    @property
+    def changed(self):
+        """
+        Indicates whether or not this value has changed.
+
+        :rtype: boolean
+
+        """
+        return self.value != self.previous_value
+
+    def getval(self):
+        """Return the current value."""
+        return self.value
+
+    def setval(self, val):
+        """
+        Updates the current value, remembering the previous one the first
+        time the column is modified.
+
+        :param val: The new value
+        :type val: mixed
+
+        """
+        self._convert()
+        instance = self.instance
+        if instance._data[self.index] is val:
+            return
+        if instance._previous is None:
+            instance._previous = {}
+        if self.index not in instance._previous:
+            instance._previous[self.index] = instance._data[self.index]
+        instance._data[self.index] = val
+
+    def delval(self):
+        """Delete a given value"""
+        self.setval(None)
+
+
+class CompactValues(object):
+    """
+    Read only mapping of column names to the value managers of an element
+    using compact storage, value managers are built on access.
+    """
+    __slots__ = ('instance',)
+
+    def __init__(self, instance):
+        self.instance = instance
+
+    def __getitem__(self, name):
+        instance = self.instance
+        return CompactValueManager(instance, instance._columns[name], instance._column_index[name])
+
+    def __contains__(self, name):
+        return name in self.instance._columns
+
+    def __iter__(self):
+        return iter(self.instance._columns)
+
+    def __len__(self):
+        return len(self.instance._columns)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+
 class Column(object):
     """Base class for column types"""
 
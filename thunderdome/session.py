@@ -0,0 +1,119 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import threading
+import weakref
+
+
+_local = threading.local()
+
+
+def current_identity_map():
+    """
+    Returns the identity map active in the current thread, if any.
+
+    :rtype: IdentityMap or None
+
+    """
+    return getattr(_local, 'identity_map', None)
+
+
+class IdentityMap(object):
+    """
+    Holds the elements deserialized during a unit of work so each vertex or
+    edge is represented by a single object. Elements are held by weak
+    reference, so they're dropped once nothing else refers to them.
+
+    Use it as a context manager to activate it for the current thread:
+
+    with IdentityMap():
+        v1 = MyVertex.get(vid)
+        v2 = MyVertex.get(vid)
+        assert v1 is v2
+    """
+
+    def __init__(self):
+        self._elements = weakref.WeakValueDictionary()
+        self._previous = None
+
+    @staticmethod
+    def key(element_type, eid):
+        """
+        Returns the key elements are stored under.
+
+        :param element_type: 'vertex' or 'edge'
+        :type element_type: str
+        :param eid: The element's Titan-specific id
+        :type eid: int
+        :rtype: tuple
+
+        """
+        return (element_type, eid)
+
+    def get(self, key):
+        """
+        Returns the element stored under the given key, or None.
+
+        :param key: The element key
+        :type key: tuple
+        :rtype: Element or None
+
+        """
+        return self._elements.get(key)
+
+    def add(self, key, element):
+        """
+        Stores the element under the given key.
+
+        :param key: The element key
+        :type key: tuple
+        :param element: The element
+        :type element: Element
+
+        """
+        self._elements[key] = element
+
+    def remove(self, key):
+        """
+        Removes the element stored under the given key, if any.
+
+        :param key: The element key
+        :type key: tuple
+
+        """
+        self._elements.pop(key, None)
+
+    def clear(self):
+        """Removes all elements."""
+        self._elements.clear()
+
+    def __contains__(self, key):
+        return key in self._elements
+
+    def __len__(self):
+        return len(self._elements)
+
+    def __enter__(self):
+        self._previous = current_identity_map()
+        _local.identity_map = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.identity_map = self._previous
+        self._previous = None
@@ -19,7 +19,12 @@
 
 from thunderdome.containers import Table
 
-from unittest import TestCase
+from unittest import TestCase, skipIf
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class Person(object):
     def __init__(self, name):
@@ -54,6 +59,56 @@ class TableTest(TestCase):
         assert self.t[1].v.name == 'eric', self.t[1].v.name
         assert self.t[2].e.nickname == 'bmoney'
 
+    def test_rows_dont_have_a_dict(self):
+        assert not hasattr(self.t[0], '__dict__')
+        assert type(self.t[0]) is type(self.t[1])
+
+    def test_nested_iteration(self):
+        pairs = [(a.v.name, b.v.name) for a in self.t for b in self.t]
+        assert len(pairs) == 9
+        assert pairs[1] == ('jon', 'eric')
+
+    def test_slicing(self):
+        t = self.t[1:]
+        assert isinstance(t, Table)
+        assert len(t) == 2
+        assert t[0].v.name == 'eric'
+        assert self.t[-1].v.name == 'blake'
+
+    def test_column(self):
+        assert [p.name for p in self.t.column('v')] == ['jon', 'eric', 'blake']
+        assert self.t.column('missing') == [None, None, None]
+
+    def test_mixed_row_keys(self):
+        t = Table([{'a': 1, 'b': 2}, {'a': 3}])
+        assert t.column('a') == [1, 3]
+        assert t.column('b') == [2, None]
+        assert t[1].a == 3
+
+    def test_reserved_column_names(self):
+        t = Table([{'_fields': 1, 'count': 2, 'index': 3, 'a': 4}])
+        row = t[0]
+        assert row._fields == ('_fields', 'a', 'count', 'index')
+        assert row.count(2) == 1
+        assert row.index(3) == 3
+        assert row.a == 4
+        assert row._asdict() == {'_fields': 1, 'count': 2, 'index': 3, 'a': 4}
+        assert t.column('count') == [2]
+        assert 'count=2' in repr(row)
+
+    def test_select(self):
+        t = self.t.select('e')
+        assert len(t) == 3
+        assert t[0].e.nickname == 'rustyrazorblade'
+        assert not hasattr(t[0], 'v')
+
+    @skipIf(numpy is None, 'numpy is not installed')
+    def test_to_numpy(self):
+        t = Table([{'a': 1, 'b': 2.5}, {'a': 3, 'b': 4.5}])
+        arr = t.to_numpy()
+        assert list(arr.a) == [1, 3]
+        assert list(arr['b']) == [2.5, 4.5]
+
 
 class EmptyTableTest(TestCase):
     def test_empty(self):
@@ -40,4 +40,7 @@ def arg_test1(self) {
 
 def arg_test2(my_id) {
     g.v(my_id)
-}
\ No newline at end of file
+}
+def paged_values(eid, start, end) {
+    return (0..<25)[start..<[end, 25].min()]
+}
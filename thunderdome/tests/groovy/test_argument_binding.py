@@ -0,0 +1,80 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome.models import Vertex
+from thunderdome import properties
+from thunderdome import gremlin
+
+
+class BindingTestModel(Vertex):
+    gremlin_path = 'groovy_test_model.groovy'
+
+    text = properties.Text()
+
+    return_value = gremlin.GremlinMethod()
+    return_default = gremlin.GremlinMethod(method_name='return_value', defaults={'val': lambda: 5000})
+    second_method = gremlin.GremlinMethod(classmethod=True, defaults={'a3': 'x'})
+
+
+class TestArgumentBinding(TestCase):
+
+    def setUp(self):
+        self.v = BindingTestModel(_id=10)
+
+    def bind(self, name, instance, *args, **kwargs):
+        method = BindingTestModel._gremlin_methods[name]
+        method._setup()
+        return method._bind_params(instance, args, kwargs)
+
+    def test_positional_and_keyword_binding(self):
+        """ Tests that positional and keyword arguments are bound to the gremlin arguments """
+        assert self.bind('return_value', self.v, 5) == {'eid': 10, 'val': 5}
+        assert self.bind('return_value', self.v, val=5) == {'eid': 10, 'val': 5}
+        assert self.bind('second_method', BindingTestModel, 1, a2=2) == {'a1': 1, 'a2': 2, 'a3': 'x'}
+
+    def test_callable_defaults(self):
+        """ Tests that callable defaults are evaluated on each call """
+        assert self.bind('return_default', self.v) == {'eid': 10, 'val': 5000}
+        assert self.bind('return_default', self.v, 3) == {'eid': 10, 'val': 3}
+
+    def test_too_many_arguments(self):
+        """ Tests that passing more arguments than the gremlin function takes raises a TypeError """
+        with self.assertRaises(TypeError):
+            self.bind('return_value', self.v, 1, 2)
+
+    def test_duplicate_and_unknown_keywords(self):
+        """ Tests that duplicate and unknown keyword arguments raise TypeErrors """
+        with self.assertRaisesRegexp(TypeError, 'multiple values'):
+            self.bind('second_method', BindingTestModel, 1, a1=2)
+        with self.assertRaisesRegexp(TypeError, 'unexpected keyword'):
+            self.bind('return_value', self.v, other=2)
+
+    def test_context_is_computed_per_class(self):
+        """ Tests that the statsd context is built from the calling class """
+        with patch.object(gremlin, 'execute_query', return_value=[]) as execute_query:
+            self.v.return_value(1)
+            BindingTestModel.second_method(1, 2)
+
+        contexts = [c[1]['context'] for c in execute_query.call_args_list]
+        assert contexts == ['vertices.binding_test_model.return_value',
+                            'vertices.binding_test_model.second_method']
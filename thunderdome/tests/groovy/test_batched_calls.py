@@ -0,0 +1,94 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import connection
+from thunderdome.models import Vertex
+from thunderdome import properties
+from thunderdome import gremlin
+
+
+class BatchTestModel(Vertex):
+    gremlin_path = 'groovy_test_model.groovy'
+
+    text = properties.Text()
+
+    get_self = gremlin.GremlinMethod()
+    return_value = gremlin.GremlinValue()
+    second_method = gremlin.GremlinValue(classmethod=True)
+
+
+def fake_batch(query, params, **kwargs):
+    """ Returns each parameter set as the results of its call """
+    return [[p] for p in params['_batch_params']]
+
+
+class TestBatchedCalls(TestCase):
+
+    def setUp(self):
+        self.vertices = [BatchTestModel(_id=i) for i in range(5)]
+
+    def test_instance_method_batches(self):
+        """ Tests that calls are sent in chunks and results are returned in order """
+        with patch.object(gremlin, 'execute_query', side_effect=fake_batch) as execute_query:
+            results = BatchTestModel.return_value.map(
+                [(v, {'val': v.eid * 2}) for v in self.vertices], chunk_size=2)
+
+        assert results == [{'eid': i, 'val': i * 2} for i in range(5)]
+        assert execute_query.call_count == 3
+        assert [len(c[0][1]['_batch_params']) for c in execute_query.call_args_list] == [2, 2, 1]
+
+    def test_batch_script(self):
+        """ Tests that the batch script defines the function and calls it per parameter set """
+        with patch.object(gremlin, 'execute_query', return_value=[[]]) as execute_query:
+            BatchTestModel.get_self.map(self.vertices[:1])
+
+        script = execute_query.call_args[0][0]
+        assert script.startswith('def get_self(eid) {')
+        assert "get_self(_p['eid'])" in script
+        assert execute_query.call_args[1]['context'] == 'vertices.batch_test_model.get_self.map'
+
+    def test_shared_keyword_arguments(self):
+        """ Tests that keyword arguments passed to map are used for every call """
+        with patch.object(gremlin, 'execute_query', side_effect=fake_batch):
+            results = BatchTestModel.return_value.map(self.vertices[:2], val=7)
+        assert results == [{'eid': 0, 'val': 7}, {'eid': 1, 'val': 7}]
+
+    def test_classmethod_batches(self):
+        """ Tests that classmethods are batched with dicts of keyword arguments """
+        with patch.object(gremlin, 'execute_query', side_effect=fake_batch):
+            results = BatchTestModel.second_method.map([{'a1': 1, 'a2': 2, 'a3': 3}])
+        assert results == [{'a1': 1, 'a2': 2, 'a3': 3}]
+
+        with self.assertRaises(TypeError):
+            BatchTestModel.second_method.map(self.vertices)
+
+    def test_parallel_chunks_are_spread_across_hosts(self):
+        """ Tests that parallel chunks are sent to each of the configured hosts """
+        hosts = [connection.Host('a', 8182), connection.Host('b', 8182)]
+        with patch.object(connection, '_hosts', hosts):
+            with patch.object(gremlin, 'execute_query', side_effect=fake_batch) as execute_query:
+                results = BatchTestModel.return_value.map(self.vertices, chunk_size=1, workers=3, val=1)
+
+        assert [r['eid'] for r in results] == range(5)
+        used = [c[1]['host'] for c in execute_query.call_args_list]
+        assert set(used) == set(hosts)
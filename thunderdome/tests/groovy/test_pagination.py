@@ -0,0 +1,93 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import types
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome.gremlin import ThunderdomeGremlinException
+from thunderdome.models import Vertex
+from thunderdome import properties
+from thunderdome import gremlin
+
+
+class PaginationTestModel(Vertex):
+    gremlin_path = 'groovy_test_model.groovy'
+
+    text = properties.Text()
+
+    paged_values = gremlin.GremlinMethod(paginate=True, page_size=10)
+    prefetched_values = gremlin.GremlinMethod(method_name='paged_values', paginate=True, page_size=10, prefetch=True)
+    unpageable = gremlin.GremlinMethod(method_name='return_value', paginate=True)
+
+
+def fake_pages(total):
+    """ Returns an execute_query replacement serving the range of `total` values """
+    def execute_query(query, params, **kwargs):
+        return range(total)[params['start']:params['end']]
+    return execute_query
+
+
+class TestPagination(TestCase):
+
+    def setUp(self):
+        self.v = PaginationTestModel(_id=1)
+
+    def test_results_are_paged(self):
+        """ Tests that pages are requested until a short page is returned """
+        with patch.object(gremlin, 'execute_query', side_effect=fake_pages(25)) as execute_query:
+            results = self.v.paged_values()
+            assert isinstance(results, types.GeneratorType)
+            assert list(results) == range(25)
+
+        ranges = [(c[0][1]['start'], c[0][1]['end']) for c in execute_query.call_args_list]
+        assert ranges == [(0, 10), (10, 20), (20, 30)]
+
+    def test_full_last_page(self):
+        """ Tests that an empty page ends iteration when the results fill the last page """
+        with patch.object(gremlin, 'execute_query', side_effect=fake_pages(20)) as execute_query:
+            assert list(self.v.paged_values()) == range(20)
+        assert execute_query.call_count == 3
+
+    def test_prefetch(self):
+        """ Tests that prefetching returns the same results """
+        with patch.object(gremlin, 'execute_query', side_effect=fake_pages(25)):
+            assert list(self.v.prefetched_values()) == range(25)
+
+    def test_range_arguments_are_required(self):
+        """ Tests that paginated methods must take start and end arguments """
+        with self.assertRaises(ThunderdomeGremlinException):
+            list(self.v.unpageable(5))
+
+    def test_range_arguments_cant_be_passed(self):
+        """ Tests that callers can't pass the range of a paginated method """
+        with patch.object(gremlin, 'execute_query', side_effect=fake_pages(25)) as execute_query:
+            with self.assertRaises(TypeError):
+                self.v.paged_values(start=5)
+            with self.assertRaises(TypeError):
+                self.v.paged_values(0, 5)
+        assert not execute_query.called
+
+    def test_single_value_methods_cant_be_paginated(self):
+        """ Tests that value and table methods reject pagination """
+        with self.assertRaises(ThunderdomeGremlinException):
+            gremlin.GremlinValue(paginate=True)
+        with self.assertRaises(ThunderdomeGremlinException):
+            gremlin.GremlinTable(paginate=True)
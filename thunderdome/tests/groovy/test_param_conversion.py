@@ -0,0 +1,83 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from datetime import datetime
+from decimal import Decimal as D
+from unittest import TestCase
+from uuid import uuid4
+
+from thunderdome import gremlin
+from thunderdome import properties
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class TestParamConversion(TestCase):
+
+    def setUp(self):
+        self.method = gremlin.GremlinMethod()
+
+    def test_python_types_are_converted(self):
+        """ Tests that datetimes, uuids and decimals are converted to their database values """
+        now = datetime.now()
+        uu = uuid4()
+        params = self.method.transform_params_to_database({'now': now, 'uu': uu, 'dec': D('1.5')})
+        assert params['now'] == properties.DateTime().to_database(now)
+        assert params['uu'] == str(uu)
+        assert params['dec'] == '1.5'
+
+    def test_elements_are_converted(self):
+        """ Tests that elements are converted to their eids and element classes to their type names """
+        v = TestModel(_id=5)
+        params = self.method.transform_params_to_database({'v': v, 'vertex_cls': TestModel, 'edge_cls': TestEdge})
+        assert params['v'] == 5
+        assert params['vertex_cls'] == TestModel.element_type
+        assert params['edge_cls'] == TestEdge.label
+
+    def test_nested_containers_are_converted(self):
+        """ Tests that values nested in lists and dicts are converted """
+        uu = uuid4()
+        params = self.method.transform_params_to_database({'a': [1, [uu], {'b': uu}]})
+        assert params == {'a': [1, [str(uu)], {'b': str(uu)}]}
+
+    def test_unconverted_containers_are_passed_through(self):
+        """ Tests that containers with nothing to convert aren't copied """
+        vids = [str(uuid4()) for i in range(10)]
+        nested = {'vids': vids, 'other': {'a': 1}}
+        params = self.method.transform_params_to_database(nested)
+        assert params is nested
+        assert params['vids'] is vids
+
+    def test_registered_converters_are_used(self):
+        """ Tests that user registered converters are used for the type and its subclasses """
+        class Point3D(Point):
+            pass
+
+        gremlin.register_param_converter(Point, lambda p: [p.x, p.y])
+        try:
+            params = self.method.transform_params_to_database({'p': Point(1, 2), 'ps': [Point3D(3, 4)]})
+            assert params == {'p': [1, 2], 'ps': [[3, 4]]}
+        finally:
+            del gremlin._param_converters[Point]
+            gremlin._param_converter_cache.clear()
@@ -0,0 +1,31 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+def vertex_json(eid, klass=TestModel, **values):
+    """ Returns the rexster json of a vertex of the given class """
+    values.update({'_id': eid, '_type': 'vertex', 'element_type': klass.get_element_type()})
+    return values
+
+
+def edge_json(eid, outV, inV, klass=TestEdge, **values):
+    """ Returns the rexster json of an edge of the given class """
+    values.update({'_id': eid, '_type': 'edge', '_label': klass.get_label(), '_outV': outV, '_inV': inV})
+    return values
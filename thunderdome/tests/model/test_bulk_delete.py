@@ -0,0 +1,87 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import gremlin, models
+from thunderdome.cache import TTLCache, element_tag
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+def fake_delete(query, params, **kwargs):
+    """ Pretends all even eids exist and are deleted, the count is wrapped in a list like rexster does """
+    return [len([eid for eid in params['eids'] if eid % 2 == 0])]
+
+
+def fake_delete_edges(query, params, **kwargs):
+    """ Pretends all even eids exist and are deleted, edge eid n connects vertices 100 + n and 200 + n """
+    return [[100 + eid, 200 + eid] for eid in params['eids'] if eid % 2 == 0]
+
+
+class TestBulkDelete(TestCase):
+
+    def test_vertices_are_deleted_in_chunks(self):
+        """ Tests that vertices and eids are deleted in chunks with progress reports """
+        vertex = TestModel(count=1)
+        vertex.eid = 4
+        progress = []
+        with patch.object(gremlin, 'execute_query', side_effect=fake_delete) as execute_query:
+            deleted = TestModel.delete_many([0, 1, 2, vertex, 5], chunk_size=2,
+                                            progress=lambda *args: progress.append(args))
+        assert deleted == 3
+        assert [c[0][1]['eids'] for c in execute_query.call_args_list] == [[0, 1], [2, 4], [5]]
+        assert progress == [(2, 5, 1), (4, 5, 3), (5, 5, 3)]
+
+    def test_generators_are_deleted(self):
+        """ Tests that vertices can be given as a generator """
+        with patch.object(gremlin, 'execute_query', side_effect=fake_delete) as execute_query:
+            deleted = TestModel.delete_many(eid for eid in [2, 4])
+        assert deleted == 2
+        assert execute_query.call_args[0][1]['eids'] == [2, 4]
+
+    def test_unsaved_elements_are_skipped(self):
+        """ Tests that elements without an eid aren't sent """
+        with patch.object(gremlin, 'execute_query', side_effect=fake_delete_edges) as execute_query:
+            deleted = TestEdge.delete_many([TestEdge(None, None), 2])
+        assert deleted == 1
+        assert execute_query.call_args[0][1]['eids'] == [2]
+
+    def test_deleted_elements_are_invalidated(self):
+        """ Tests that cached entries of deleted elements are dropped """
+        cache = TTLCache()
+        cache.set('edge:eid:2', {}, [element_tag(2)])
+        cache.set('vertex:eid:102', {}, [element_tag(102)])
+        cache.set('vertex:eid:202', {}, [element_tag(202)])
+        with patch.object(gremlin, 'execute_query', side_effect=fake_delete_edges):
+            TestEdge.delete_many([2])
+        for key in ('edge:eid:2', 'vertex:eid:102', 'vertex:eid:202'):
+            with self.assertRaises(KeyError):
+                cache.get(key)
+
+    def test_delete_by_query(self):
+        """ Tests that query deletes look up the matching ids then delete them in chunks """
+        vertex = TestModel(count=1)
+        vertex.eid = 1
+        with patch.object(models, 'execute_query', return_value=[2, 4, 6]) as lookup:
+            with patch.object(gremlin, 'execute_query', side_effect=fake_delete_edges) as execute_query:
+                deleted = vertex.query().labels('test').delete_edges(chunk_size=2)
+        assert deleted == 3
+        assert lookup.call_args[0][0] == "g.v(eid).query().labels('test').edges().collect{it.id}"
+        assert len(execute_query.call_args_list) == 2
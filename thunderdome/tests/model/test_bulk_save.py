@@ -0,0 +1,84 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from itertools import count
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import gremlin
+from thunderdome.exceptions import ValidationError
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+def fake_save(eids):
+    """ Returns an execute_query replacement assigning eids to new elements """
+    def execute_query(query, params, **kwargs):
+        items = params.get('vertices', params.get('edges'))
+        return [item['eid'] if item['eid'] is not None else next(eids) for item in items]
+    return execute_query
+
+
+class TestBulkSave(TestCase):
+
+    def test_vertices_are_saved_in_chunks(self):
+        """ Tests that vertices are sent in chunks and updated in place """
+        vertices = [TestModel(count=i) for i in range(5)]
+        with patch.object(gremlin, 'execute_query', side_effect=fake_save(count(100))) as execute_query:
+            results = TestModel.save_many(vertices, chunk_size=2)
+        assert results == vertices
+        assert [v.eid for v in vertices] == [100, 101, 102, 103, 104]
+        assert [len(c[0][1]['vertices']) for c in execute_query.call_args_list] == [2, 2, 1]
+        attrs = execute_query.call_args_list[0][0][1]['vertices'][0]['attrs']
+        assert attrs['element_type'] == TestModel.get_element_type()
+        assert attrs['count'] == 0
+        assert vertices[0].vid is not None
+        assert not any(v._values['count'].changed for v in vertices)
+
+    def test_validation_happens_before_sending(self):
+        """ Tests that nothing is sent if any of the vertices is invalid """
+        vertices = [TestModel(count=1), TestModel(count=2)]
+        vertices[1].count = 'a'
+        with patch.object(gremlin, 'execute_query') as execute_query:
+            with self.assertRaises(ValidationError):
+                TestModel.save_many(vertices)
+        assert not execute_query.called
+
+    def test_edges_are_validated_before_new_vertices_are_saved(self):
+        """ Tests that an invalid edge doesn't leave the new vertices it points to in the graph """
+        v1, v2 = TestModel(count=1), TestModel(count=2)
+        edges = [TestEdge(v1, v2, numbers=1), TestEdge(v2, v1)]
+        edges[1].numbers = 'a'
+        with patch.object(gremlin, 'execute_query') as execute_query:
+            with self.assertRaises(ValidationError):
+                TestEdge.save_many(edges)
+        assert not execute_query.called
+        assert (v1.eid, v2.eid) == (None, None)
+
+    def test_edges_can_use_new_vertices(self):
+        """ Tests that unsaved vertices are saved before the edges pointing to them """
+        v1, v2 = TestModel(count=1), TestModel(count=2)
+        with patch.object(gremlin, 'execute_query', side_effect=fake_save(count(1))) as execute_query:
+            edges = TestEdge.create_many([(v1, v2, {'numbers': 3}), (v2, v1)])
+        assert (v1.eid, v2.eid) == (1, 2)
+        assert [e.eid for e in edges] == [3, 4]
+        assert len(execute_query.call_args_list) == 2
+        payload = execute_query.call_args_list[1][0][1]['edges']
+        assert [(p['outV'], p['inV']) for p in payload] == [(1, 2), (2, 1)]
+        assert payload[0]['label'] == TestEdge.get_label()
+        assert payload[0]['attrs']['numbers'] == 3
@@ -0,0 +1,118 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import gremlin, properties
+from thunderdome.models import Element, Vertex, Edge, ModelException
+
+
+class CompactVertex(Vertex):
+    __compact_storage__ = True
+
+    name = properties.Text()
+    count = properties.Integer()
+    tags = properties.List()
+
+
+class CompactSubVertex(CompactVertex):
+    extra = properties.Text()
+
+
+class CompactEdge(Edge):
+    __compact_storage__ = True
+
+    weight = properties.Integer()
+
+
+class TestCompactStorage(TestCase):
+
+    def test_values_are_stored_in_a_list(self):
+        """ Tests that compact elements hold their values in a list without value managers """
+        v = CompactVertex(name='a', count='1')
+        assert v.count == 1
+        assert v._data[v._column_index['count']] == 1
+        assert v._previous is None
+        assert 'vid' in v._values
+
+    def test_previous_values_are_kept_for_modified_columns(self):
+        """ Tests that only modified columns get a previous value """
+        v = CompactVertex(name='a', count=1)
+        v.count = 2
+        assert v._previous == {v._column_index['count']: 1}
+        assert v._values['count'].changed
+        assert v._values['count'].previous_value == 1
+        assert not v._values['name'].changed
+        v.count = 1
+        assert not v._values['count'].changed
+
+    def test_in_place_changes_are_detected(self):
+        """ Tests that in place changes to mutable values are seen as changes """
+        v = CompactVertex(tags=[1])
+        v.tags.append(2)
+        assert v._values['tags'].changed
+
+    def test_deletion(self):
+        """ Tests that deleted values are reported as deleted """
+        v = CompactVertex(name='a')
+        del v.name
+        assert v.name is None
+        assert v._values['name'].deleted
+
+    def test_inherited_columns(self):
+        """ Tests that subclasses lay out inherited and new columns """
+        v = CompactSubVertex(name='a', extra='b')
+        assert (v.name, v.extra) == ('a', 'b')
+        assert len(v._data) == len(CompactSubVertex._columns)
+
+    def test_deserialization(self):
+        """ Tests that compact elements are deserialized into compact storage """
+        v = Element.deserialize({'_id': 1, '_type': 'vertex', 'element_type': CompactVertex.get_element_type(),
+                                 'name': 'a', 'count': 3})
+        assert isinstance(v, CompactVertex)
+        assert (v.eid, v.name, v.count) == (1, 'a', 3)
+        assert not any(m.changed for m in v._values.values())
+        e = Element.deserialize({'_id': 2, '_type': 'edge', '_label': CompactEdge.get_label(),
+                                 '_outV': 1, '_inV': 3, 'weight': 4})
+        assert (e.eid, e._outV, e.weight) == (2, 1, 4)
+
+    def test_save(self):
+        """ Tests that saving sends the values and resets the previous values """
+        v = CompactVertex(name='a', count=1)
+        v.count = 2
+        with patch.object(gremlin, 'execute_query', return_value=[{'_id': 5}]) as execute_query:
+            v.save()
+        attrs = execute_query.call_args[0][1]['attrs']
+        assert (attrs['name'], attrs['count']) == ('a', 2)
+        assert v.eid == 5
+        assert v._previous is None
+
+    def test_custom_value_managers_are_rejected(self):
+        """ Tests that columns with custom value managers can't use compact storage """
+        class CustomManager(properties.BaseValueManager):
+            pass
+
+        class CustomColumn(properties.Text):
+            value_manager = CustomManager
+
+        with self.assertRaises(ModelException):
+            class CustomVertex(Vertex):
+                __compact_storage__ = True
+                name = CustomColumn()
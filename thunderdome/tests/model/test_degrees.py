@@ -0,0 +1,84 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import gremlin
+from thunderdome.connection import ThunderdomeQueryError
+from thunderdome.exceptions import ThunderdomeException
+from thunderdome.models import IN, OUT, BOTH
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+def fake_degrees(query, params, **kwargs):
+    """ Pretends every vertex has as many edges as its eid """
+    return [[eid, eid] for eid in params['eids']]
+
+
+class TestDegrees(TestCase):
+
+    def test_degree(self):
+        """ Tests that a vertex degree is counted on the server """
+        v = TestModel(_id=3, count=1)
+        with patch.object(gremlin, 'execute_query', side_effect=fake_degrees) as execute_query:
+            assert v.degree(OUT, TestEdge) == 3
+        params = execute_query.call_args[0][1]
+        assert params['eids'] == [3]
+        assert params['direction'] == OUT
+        assert params['labels'] == [TestEdge.get_label()]
+        assert params['element_types'] is None
+        assert params['by_label'] is False
+
+    def test_degrees_in_chunks(self):
+        """ Tests that degrees of many vertices are counted one query per chunk """
+        v = TestModel(_id=4, count=1)
+        with patch.object(gremlin, 'execute_query', side_effect=fake_degrees) as execute_query:
+            degrees = TestModel.degrees([1, 2, 3, v, 5], IN, chunk_size=2, types=[TestModel])
+        assert degrees == {1: 1, 2: 2, 3: 3, 4: 4, 5: 5}
+        assert [c[0][1]['eids'] for c in execute_query.call_args_list] == [[1, 2], [3, 4], [5]]
+        assert execute_query.call_args[0][1]['element_types'] == [TestModel.get_element_type()]
+
+    def test_degree_by_label(self):
+        """ Tests that counts can be grouped by edge label """
+        v = TestModel(_id=3, count=1)
+        with patch.object(gremlin, 'execute_query', return_value=[[3, {'test_edge': 2, 'other': 1}]]) as execute_query:
+            assert v.degree(BOTH, by_label=True) == {'test_edge': 2, 'other': 1}
+        params = execute_query.call_args[0][1]
+        assert params['labels'] == []
+        assert params['by_label'] is True
+
+    def test_invalid_direction(self):
+        """ Tests that unknown directions are rejected """
+        with self.assertRaises(ThunderdomeQueryError):
+            TestModel.degrees([1], 'sideways')
+
+    def test_missing_vertices(self):
+        """ Tests that vertices missing from the graph come back as None """
+        with patch.object(gremlin, 'execute_query', return_value=[[1, 4], [2, None]]):
+            assert TestModel.degrees([1, 2], OUT) == {1: 4, 2: None}
+
+    def test_unsaved_vertex(self):
+        """ Tests that counting the edges of unsaved vertices is rejected """
+        with patch.object(gremlin, 'execute_query') as execute_query:
+            with self.assertRaises(ThunderdomeException):
+                TestModel(count=1).degree(OUT)
+            with self.assertRaises(ThunderdomeException):
+                TestModel.degrees([TestModel(_id=1, count=1), TestModel(count=1)], OUT)
+        assert not execute_query.called
@@ -0,0 +1,133 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import gremlin
+from thunderdome import properties
+from thunderdome.models import Element, Vertex
+from thunderdome.tests.mocks import vertex_json
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+class DeserializeTestModel(Vertex):
+    count = properties.Integer(db_field='how_many')
+    text  = properties.Text()
+
+    gremlin_path = 'deserialize.groovy'
+
+    get_list = gremlin.GremlinMethod()
+    get_list_of_models = gremlin.GremlinMethod(method_name='get_list', returns=TestModel)
+    get_list_of_vertices = gremlin.GremlinMethod(method_name='get_list', returns=Vertex)
+    get_table = gremlin.GremlinMethod(method_name='get_list', returns='table')
+    get_scalar = gremlin.GremlinMethod(method_name='get_list', returns='scalar')
+
+
+class CustomInitModel(Vertex):
+    text = properties.Text()
+
+    def __init__(self, **values):
+        super(CustomInitModel, self).__init__(**values)
+        self.initialized = True
+
+
+class TestElementDeserialization(TestCase):
+
+    def test_vertex_deserialization(self):
+        """ Tests that vertices are deserialized with db fields mapped to their columns """
+        data = vertex_json(5, DeserializeTestModel, how_many=3, text='abc', vid='xyz')
+        v = Element.deserialize(data)
+        assert isinstance(v, DeserializeTestModel)
+        assert v.eid == 5
+        assert v.count == 3
+        assert v.text == 'abc'
+        assert v.vid == 'xyz'
+        assert not v._values['count'].changed
+        assert 'how_many' in data
+
+    def test_edge_deserialization(self):
+        """ Tests that edges are deserialized with their in and out vertex eids """
+        data = {'_id': 7, '_type': 'edge', '_label': TestEdge.get_label(), '_outV': 1, '_inV': 2, 'numbers': 4}
+        e = Element.deserialize(data)
+        assert isinstance(e, TestEdge)
+        assert e.eid == 7
+        assert e._outV == 1
+        assert e._inV == 2
+        assert e.numbers == 4
+
+    def test_custom_init_is_called(self):
+        """ Tests that classes defining __init__ are still built through it """
+        v = Element.deserialize(vertex_json(5, CustomInitModel, text='abc'))
+        assert v.initialized
+        assert v.text == 'abc'
+
+
+class TestReturnsHint(TestCase):
+
+    def setUp(self):
+        self.v = DeserializeTestModel(_id=5)
+        self.vertex = vertex_json(6, DeserializeTestModel, how_many=1)
+
+    def call(self, name, results):
+        with patch.object(gremlin, 'execute_query', return_value=results):
+            return getattr(self.v, name)()
+
+    def test_invalid_hint(self):
+        """ Tests that unknown returns hints are rejected """
+        with self.assertRaises(gremlin.ThunderdomeGremlinException):
+            gremlin.GremlinMethod(returns='bogus')
+
+    def test_invalid_class_hint(self):
+        """ Tests that classes other than elements are rejected """
+        with self.assertRaises(gremlin.ThunderdomeGremlinException):
+            gremlin.GremlinMethod(returns=dict)
+
+    def test_element_class_hint_checks_types(self):
+        """ Tests that subclasses of the hinted class are deserialized as themselves and others are rejected """
+        results = self.call('get_list_of_vertices', [self.vertex, vertex_json(7, TestModel, count=1)])
+        assert isinstance(results[0], DeserializeTestModel)
+        assert isinstance(results[1], TestModel)
+        with self.assertRaises(gremlin.ThunderdomeGremlinException):
+            self.call('get_list_of_models', [self.vertex])
+
+    def test_element_class_hint(self):
+        """ Tests that results are deserialized as elements of the hinted class """
+        results = self.call('get_list_of_models', [vertex_json(6, TestModel, count=1), None])
+        assert isinstance(results[0], TestModel)
+        assert results[0].count == 1
+        assert results[1] is None
+
+    def test_table_hint(self):
+        """ Tests that elements in table rows are deserialized """
+        results = self.call('get_table', [{'v': self.vertex, 'n': 1}])
+        assert isinstance(results[0]['v'], DeserializeTestModel)
+        assert results[0]['n'] == 1
+
+    def test_scalar_hint(self):
+        """ Tests that scalar results are returned untouched """
+        results = [self.vertex, 1]
+        assert self.call('get_scalar', results) is results
+
+    def test_default_deserializes_recursively(self):
+        """ Tests that results are deserialized recursively without a hint """
+        results = self.call('get_list', [[self.vertex], {'v': self.vertex}])
+        assert isinstance(results[0][0], DeserializeTestModel)
+        assert isinstance(results[1]['v'], DeserializeTestModel)
@@ -0,0 +1,63 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import gremlin
+from thunderdome.models import PaginatedVertex
+from thunderdome.tests.mocks import vertex_json, edge_json
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+class PairedPaginatedVertex(PaginatedVertex):
+    pass
+
+
+class TestEdgeVertexPairs(TestCase):
+
+    def test_out_pairs(self):
+        """ Tests that outEV returns edge and vertex tuples from one traversal """
+        v = TestModel(_id=1, count=1)
+        results = [[edge_json(10, 1, 2), vertex_json(2, count=2)], [edge_json(11, 1, 3), vertex_json(3, count=3)]]
+        with patch.object(gremlin, 'execute_query', return_value=results) as execute_query:
+            pairs = v.outEV(TestEdge, limit=2, offset=4, types=[TestModel])
+        assert [(e.eid, u.eid) for e, u in pairs] == [(10, 2), (11, 3)]
+        assert all(isinstance(e, TestEdge) and isinstance(u, TestModel) for e, u in pairs)
+        params = execute_query.call_args[0][1]
+        assert params['operation'] == 'outEV'
+        assert params['labels'] == [TestEdge.get_label()]
+        assert (params['start'], params['end']) == (4, 6)
+        assert params['element_types'] == [TestModel.get_element_type()]
+
+    def test_in_pairs(self):
+        """ Tests that inEV traverses incoming edges """
+        v = TestModel(_id=2, count=2)
+        with patch.object(gremlin, 'execute_query', return_value=[[edge_json(10, 1, 2), vertex_json(1, count=1)]]) as execute_query:
+            pairs = v.inEV()
+        assert [(e.eid, u.eid) for e, u in pairs] == [(10, 1)]
+        assert execute_query.call_args[0][1]['operation'] == 'inEV'
+
+    def test_paginated_pairs(self):
+        """ Tests that paginated vertices page through pairs """
+        v = PairedPaginatedVertex(_id=1)
+        with patch.object(gremlin, 'execute_query', return_value=[]) as execute_query:
+            v.outEV(page_num=3, per_page=10)
+        params = execute_query.call_args[0][1]
+        assert (params['start'], params['end']) == (20, 30)
@@ -0,0 +1,68 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import gc
+from unittest import TestCase
+
+from thunderdome.models import Element
+from thunderdome.session import IdentityMap, current_identity_map
+from thunderdome.tests.mocks import vertex_json
+from thunderdome.tests.models import TestEdge
+
+
+class TestIdentityMap(TestCase):
+
+    def test_disabled_by_default(self):
+        """ Tests that elements are rebuilt when no identity map is active """
+        assert current_identity_map() is None
+        assert Element.deserialize(vertex_json(1, count=1)) is not Element.deserialize(vertex_json(1, count=1))
+
+    def test_elements_are_deserialized_once(self):
+        """ Tests that the same element is returned for the same eid within the map """
+        with IdentityMap() as identity_map:
+            v1 = Element.deserialize(vertex_json(1, count=1))
+            v1.count = 5
+            v2 = Element.deserialize(vertex_json(1, count=2))
+            assert v1 is v2
+            assert v2.count == 5
+            assert len(identity_map) == 1
+        assert current_identity_map() is None
+
+    def test_vertices_and_edges_are_keyed_separately(self):
+        """ Tests that a vertex and an edge with the same eid don't collide """
+        edge = {'_id': 1, '_type': 'edge', '_label': TestEdge.get_label(), '_outV': 2, '_inV': 3}
+        with IdentityMap():
+            v = Element.deserialize(vertex_json(1, count=1))
+            e = Element.deserialize(edge)
+            assert isinstance(e, TestEdge)
+            assert v is not e
+
+    def test_weak_references(self):
+        """ Tests that elements are dropped once they're no longer referenced """
+        with IdentityMap() as identity_map:
+            Element.deserialize(vertex_json(1, count=1))
+            gc.collect()
+            assert len(identity_map) == 0
+
+    def test_nested_maps(self):
+        """ Tests that the previous map is restored when a nested map exits """
+        with IdentityMap() as outer:
+            with IdentityMap() as inner:
+                assert current_identity_map() is inner
+            assert current_identity_map() is outer
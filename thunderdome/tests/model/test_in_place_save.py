@@ -0,0 +1,71 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import gremlin, properties
+from thunderdome.models import Vertex
+from thunderdome.session import IdentityMap
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+class ServerStampedVertex(Vertex):
+    __server_fields__ = ('stamp',)
+
+    name = properties.Text()
+    stamp = properties.Integer(db_field='server_stamp')
+
+
+class TestInPlaceSave(TestCase):
+
+    def test_vertex_is_updated_in_place(self):
+        """ Tests that saving a vertex updates and returns the same instance """
+        vertex = TestModel(count=1)
+        with patch.object(gremlin, 'execute_query', return_value=[{'_id': 5}]) as execute_query:
+            assert vertex.save() is vertex
+        assert vertex.eid == 5
+        assert execute_query.call_args[0][1]['fields'] == []
+        vertex.count = 2
+        assert vertex._values['count'].changed
+        assert vertex._values['count'].previous_value == 1
+
+    def test_server_fields_are_read_back(self):
+        """ Tests that the server set columns are requested and applied """
+        vertex = ServerStampedVertex(name='a')
+        with patch.object(gremlin, 'execute_query', return_value=[{'_id': 5, 'server_stamp': '7'}]) as execute_query:
+            vertex.save()
+        assert execute_query.call_args[0][1]['fields'] == ['server_stamp']
+        assert vertex.stamp == 7
+        assert not vertex._values['stamp'].changed
+
+    def test_edge_is_updated_in_place(self):
+        """ Tests that saving an edge updates and returns the same instance """
+        edge = TestEdge(1, 2, numbers=3)
+        with patch.object(gremlin, 'execute_query', return_value=[{'_id': 9}]):
+            assert edge.save() is edge
+        assert edge.eid == 9
+
+    def test_saved_elements_join_the_identity_map(self):
+        """ Tests that saved elements are registered in the active identity map """
+        vertex = TestModel(count=1)
+        with IdentityMap() as identity_map:
+            with patch.object(gremlin, 'execute_query', return_value=[{'_id': 5}]):
+                vertex.save()
+            assert identity_map.get(identity_map.key('vertex', 5)) is vertex
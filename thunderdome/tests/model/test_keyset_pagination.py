@@ -0,0 +1,106 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import gremlin
+from thunderdome.connection import ThunderdomeQueryError
+from thunderdome.models import PaginatedVertex, Page
+from thunderdome.tests.mocks import vertex_json, edge_json
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+class CursorPaginatedVertex(PaginatedVertex):
+    pass
+
+
+class TestKeysetPagination(TestCase):
+
+    def test_first_page(self):
+        """ Tests that the first page seeks from the start of the sort key and returns a cursor """
+        v = TestModel(_id=1, count=1)
+        rows = [[5, 10, vertex_json(2, count=2)], [7, 11, vertex_json(3, count=3)]]
+        with patch.object(gremlin, 'execute_query', return_value=rows) as execute_query:
+            page = v.outV(TestEdge, sort_key='updated_at', limit=2)
+        assert isinstance(page, Page)
+        assert [u.eid for u in page] == [2, 3]
+        params = execute_query.call_args[0][1]
+        assert params['operation'] == 'outV'
+        assert params['labels'] == [TestEdge.get_label()]
+        assert params['sort_key'] == 'updated_at'
+        assert params['after'] is None
+        assert params['seen'] == []
+        assert params['limit'] == 2
+        assert page.cursor is not None
+
+    def test_next_page(self):
+        """ Tests that a cursor resumes after the last key and edge of the previous page """
+        v = TestModel(_id=1, count=1)
+        rows = [[5, 10, edge_json(10, 1, 2)], [7, 11, edge_json(11, 1, 3)]]
+        with patch.object(gremlin, 'execute_query', return_value=rows):
+            page = v.outE(TestEdge, sort_key='updated_at', limit=2)
+        with patch.object(gremlin, 'execute_query', return_value=[[9, 12, edge_json(12, 1, 4)]]) as execute_query:
+            page = v.outE(TestEdge, cursor=page.cursor, limit=2)
+        assert [e.eid for e in page] == [12]
+        params = execute_query.call_args[0][1]
+        assert params['sort_key'] == 'updated_at'
+        assert params['after'] == 7
+        assert params['seen'] == [11]
+        assert page.cursor is None
+
+    def test_cursor_keeps_ties(self):
+        """ Tests that edges sharing the last key stay in the cursor across pages """
+        v = TestModel(_id=1, count=1)
+        with patch.object(gremlin, 'execute_query', return_value=[[3, 10, vertex_json(2, count=2)], [5, 11, vertex_json(3, count=3)]]):
+            page = v.inV(sort_key='score', limit=2)
+        with patch.object(gremlin, 'execute_query', return_value=[[5, 12, vertex_json(4, count=4)], [5, 13, vertex_json(5, count=5)]]):
+            page = v.inV(cursor=page.cursor, limit=2)
+        with patch.object(gremlin, 'execute_query', return_value=[]) as execute_query:
+            page = v.inV(cursor=page.cursor, limit=2)
+        params = execute_query.call_args[0][1]
+        assert params['operation'] == 'inV'
+        assert params['after'] == 5
+        assert params['seen'] == [11, 12, 13]
+        assert page == [] and page.cursor is None
+
+    def test_requires_limit(self):
+        """ Tests that cursor pagination needs a limit and rejects offsets """
+        v = TestModel(_id=1, count=1)
+        with self.assertRaises(ThunderdomeQueryError):
+            v.outV(sort_key='updated_at')
+        with self.assertRaises(ThunderdomeQueryError):
+            v.outV(sort_key='updated_at', limit=2, offset=4)
+
+    def test_invalid_cursor(self):
+        """ Tests that a malformed cursor is rejected """
+        v = TestModel(_id=1, count=1)
+        with self.assertRaises(ThunderdomeQueryError):
+            v.outV(cursor='not a cursor', limit=2)
+
+    def test_paginated_vertex(self):
+        """ Tests that paginated vertices take cursors in place of page numbers """
+        v = CursorPaginatedVertex(_id=1)
+        with patch.object(gremlin, 'execute_query', return_value=[[5, 10, vertex_json(2, count=2)]]) as execute_query:
+            page = v.outV(TestEdge, sort_key='updated_at', per_page=1)
+        assert [u.eid for u in page] == [2]
+        params = execute_query.call_args[0][1]
+        assert params['limit'] == 1
+        assert params['sort_key'] == 'updated_at'
+        assert page.cursor is not None
@@ -0,0 +1,84 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from datetime import datetime
+from decimal import Decimal
+from unittest import TestCase
+from uuid import uuid4
+
+from mock import patch
+
+from thunderdome import gremlin, properties
+from thunderdome.models import Element, Vertex
+
+
+class LazyVertex(Vertex):
+    __lazy_conversion__ = True
+
+    created = properties.DateTime()
+    price = properties.Decimal()
+    tags = properties.List()
+
+
+def lazy_vertex(**values):
+    data = {'_id': 1, '_type': 'vertex', 'element_type': LazyVertex.get_element_type()}
+    data.update(values)
+    return Element.deserialize(data)
+
+
+class TestLazyConversion(TestCase):
+
+    def test_lazy_conversion_implies_compact_storage(self):
+        """ Tests that lazily converted models use compact storage """
+        assert LazyVertex.__compact_storage__
+
+    def test_values_are_converted_on_access(self):
+        """ Tests that raw values are kept until the column is read """
+        v = lazy_vertex(created=0, price='1.5')
+        index = LazyVertex._column_index['price']
+        assert v._data[index] == '1.5'
+        assert v.price == Decimal('1.5')
+        assert v._data[index] == Decimal('1.5')
+        assert not v._pending & (1 << index)
+        assert isinstance(v.created, datetime)
+        assert v._pending == 0
+
+    def test_conversion_is_cached(self):
+        """ Tests that each value is converted only once """
+        v = lazy_vertex(price='1.5')
+        with patch.object(properties.Decimal, 'to_python', return_value=Decimal('2')) as to_python:
+            v.price
+            v.price
+        assert to_python.call_count == 1
+
+    def test_changes_are_tracked(self):
+        """ Tests that modified lazy values report their converted previous value """
+        v = lazy_vertex(price='1.5', tags=[1])
+        v.price = Decimal('2')
+        assert v._values['price'].previous_value == Decimal('1.5')
+        assert v._values['price'].changed
+        v.tags.append(2)
+        assert v._values['tags'].changed
+
+    def test_save_sends_converted_values(self):
+        """ Tests that unread values are converted when saving """
+        v = lazy_vertex(vid=str(uuid4()), price='1.5')
+        with patch.object(gremlin, 'execute_query', return_value=[{'_id': 1}]) as execute_query:
+            v.save()
+        assert execute_query.call_args[0][1]['attrs']['price'] == '1.5'
+        assert v._pending == 0
@@ -0,0 +1,164 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from unittest import TestCase
+from uuid import uuid4
+
+from mock import patch
+
+from thunderdome import models
+from thunderdome import properties
+from thunderdome.cache import TTLCache
+from thunderdome.models import Vertex, Edge
+from thunderdome.tests.mocks import vertex_json, edge_json
+
+
+class CachedVertex(Vertex):
+    __cache__ = TTLCache(ttl=30, maxsize=100)
+
+    name = properties.Text()
+    tags = properties.List()
+
+
+class CachedEdge(Edge):
+    __cache__ = TTLCache(ttl=30, maxsize=100)
+
+
+class TestLookupCache(TestCase):
+
+    def setUp(self):
+        CachedVertex.__cache__.clear()
+        CachedEdge.__cache__.clear()
+
+    def test_get_reads_through_cache(self):
+        """ Tests that repeated gets only query the graph once """
+        with patch.object(models, 'execute_query', return_value=[vertex_json(1, CachedVertex, vid='a')]) as execute_query:
+            v1 = CachedVertex.get('a')
+            v2 = CachedVertex.get('a')
+        assert execute_query.call_count == 1
+        assert v1.vid == v2.vid == 'a'
+        assert v1 is not v2
+
+    def test_all_only_queries_missing_vids(self):
+        """ Tests that all only queries the vids that aren't cached, preserving order """
+        with patch.object(models, 'execute_query', return_value=[vertex_json(1, CachedVertex, vid='a')]):
+            CachedVertex.get('a')
+        with patch.object(models, 'execute_query', return_value=[vertex_json(2, CachedVertex, vid='b')]) as execute_query:
+            results = CachedVertex.all(['b', 'a'])
+        assert execute_query.call_args[0][1] == {'vids': ['b']}
+        assert [v.vid for v in results] == ['b', 'a']
+
+    def test_misses_are_not_cached(self):
+        """ Tests that vertices which weren't found aren't cached """
+        with patch.object(models, 'execute_query', return_value=[None]) as execute_query:
+            for i in range(2):
+                with self.assertRaises(CachedVertex.DoesNotExist):
+                    CachedVertex.get('a')
+        assert execute_query.call_count == 2
+
+    def test_get_by_eid(self):
+        """ Tests that vertex and edge lookups by eid read through the cache """
+        edge = edge_json(3, 1, 2, CachedEdge)
+        with patch.object(models, 'execute_query', side_effect=[[vertex_json(1, CachedVertex, vid='a')], [edge]]) as execute_query:
+            for i in range(2):
+                assert CachedVertex.get_by_eid(1).eid == 1
+                assert CachedEdge.get_by_eid(3).eid == 3
+        assert execute_query.call_count == 2
+        assert CachedVertex.__cache__.stats()['hits'] >= 1
+
+    def test_write_invalidation(self):
+        """ Tests that entries are invalidated when their element is saved or deleted """
+        with patch.object(models, 'execute_query', return_value=[vertex_json(1, CachedVertex, vid='a')]) as execute_query:
+            v = CachedVertex.get('a')
+            CachedVertex.get_by_eid(1)
+            v.delete()
+            CachedVertex.get('a')
+            CachedVertex.get_by_eid(1)
+        assert execute_query.call_count == 5
+
+    def test_uncached_models(self):
+        """ Tests that models without a cache always query the graph """
+        from thunderdome.tests.models import TestModel
+        json = {'_id': 1, '_type': 'vertex', 'element_type': TestModel.get_element_type(), 'vid': 'a'}
+        with patch.object(models, 'execute_query', return_value=[json]) as execute_query:
+            TestModel.get('a')
+            TestModel.get('a')
+        assert execute_query.call_count == 2
+
+    def test_cached_json_is_copied(self):
+        """ Tests that mutating a loaded element doesn't change what later loads return """
+        with patch.object(models, 'execute_query', return_value=[vertex_json(1, CachedVertex, vid='a', tags=['x'])]) as execute_query:
+            v1 = CachedVertex.get('a')
+            v1.tags.append('mutated')
+            v2 = CachedVertex.get('a')
+            v2.tags.append('mutated')
+            v3 = CachedVertex.get('a')
+        assert execute_query.call_count == 1
+        assert v2.tags == ['x', 'mutated']
+        assert v3.tags == ['x']
+
+
+class NegativeCachedVertex(Vertex):
+    __negative_cache__ = TTLCache(ttl=5, maxsize=100)
+
+    name = properties.Text()
+
+
+class TestNegativeLookupCache(TestCase):
+
+    def setUp(self):
+        NegativeCachedVertex.__negative_cache__.clear()
+
+    def test_misses_are_remembered(self):
+        """ Tests that a vid that wasn't found isn't queried again """
+        hits = NegativeCachedVertex.__negative_cache__.hits
+        with patch.object(models, 'execute_query', return_value=[None]) as execute_query:
+            for i in range(3):
+                with self.assertRaises(NegativeCachedVertex.DoesNotExist):
+                    NegativeCachedVertex.get('a')
+        assert execute_query.call_count == 1
+        assert NegativeCachedVertex.__negative_cache__.hits - hits == 2
+
+    def test_eid_misses_are_remembered(self):
+        """ Tests that an eid that wasn't found isn't queried again """
+        with patch.object(models, 'execute_query', return_value=[]) as execute_query:
+            for i in range(2):
+                with self.assertRaises(NegativeCachedVertex.DoesNotExist):
+                    NegativeCachedVertex.get_by_eid(5)
+        assert execute_query.call_count == 1
+
+    def test_found_vertices_are_not_remembered(self):
+        """ Tests that vertices which were found are still queried every time """
+        json = {'_id': 1, '_type': 'vertex', 'element_type': NegativeCachedVertex.get_element_type(), 'vid': 'a'}
+        with patch.object(models, 'execute_query', return_value=[json]) as execute_query:
+            NegativeCachedVertex.get('a')
+            NegativeCachedVertex.get('a')
+        assert execute_query.call_count == 2
+
+    def test_creating_the_vid_invalidates_the_miss(self):
+        """ Tests that saving a vertex with a remembered vid removes the miss """
+        vid = str(uuid4())
+        with patch.object(models, 'execute_query', return_value=[None]):
+            with self.assertRaises(NegativeCachedVertex.DoesNotExist):
+                NegativeCachedVertex.get(vid)
+
+        v = NegativeCachedVertex(vid=vid)
+        with patch.object(NegativeCachedVertex, '_save_vertex', return_value=[{'_id': 1}]):
+            v.save()
+        assert len(NegativeCachedVertex.__negative_cache__) == 0
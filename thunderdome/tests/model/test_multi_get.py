@@ -0,0 +1,70 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import models
+from thunderdome.connection import ThunderdomeQueryError
+from thunderdome.tests.models import TestModel
+
+
+def fake_lookup(existing):
+    """ Returns an execute_query replacement finding the given vids """
+    def execute_query(query, params, **kwargs):
+        return [{'_id': 1, '_type': 'vertex', 'element_type': TestModel.get_element_type(), 'vid': vid}
+                if vid in existing else None for vid in params['vids']]
+    return execute_query
+
+
+class TestMultiGet(TestCase):
+
+    def test_chunked_lookup_keeps_order(self):
+        """ Tests that vids are looked up in chunks and results keep the input order """
+        vids = ['v{}'.format(i) for i in range(7)]
+        with patch.object(models, 'execute_query', side_effect=fake_lookup(vids)) as execute_query:
+            results = TestModel.all(list(reversed(vids)), chunk_size=3, workers=2)
+        assert [v.vid for v in results] == list(reversed(vids))
+        assert sorted(len(c[0][1]['vids']) for c in execute_query.call_args_list) == [1, 3, 3]
+
+    def test_missing_vids_raise(self):
+        """ Tests that missing vids raise an error by default """
+        with patch.object(models, 'execute_query', side_effect=fake_lookup(['a'])):
+            with self.assertRaises(ThunderdomeQueryError):
+                TestModel.all(['a', 'b'])
+
+    def test_partial_results(self):
+        """ Tests that partial lookups return the vertices found and the missing vids """
+        with patch.object(models, 'execute_query', side_effect=fake_lookup(['a', 'c'])):
+            found, missing = TestModel.all(['a', 'b', 'c', 'd'], partial=True)
+            assert [v.vid for v in found] == ['a', 'c']
+            assert missing == ['b', 'd']
+
+            found, missing = TestModel.all(['a', 'b'], as_dict=True, partial=True)
+            assert found.keys() == ['a']
+            assert missing == ['b']
+
+    def test_index_lookup_stops_at_first_match(self):
+        """ Tests that the lookup iterates the vid index instead of listing it """
+        with patch.object(models, 'execute_query', side_effect=fake_lookup(['a'])) as execute_query:
+            TestModel.get('a')
+        query = execute_query.call_args[0][0]
+        assert 'toList()' not in query
+        assert 'hasNext()' in query
@@ -0,0 +1,73 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import gremlin, models
+from thunderdome.exceptions import ThunderdomeException
+from thunderdome.models import prefetch_vertices
+from thunderdome.tests.mocks import vertex_json, edge_json
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+def fake_lookup(query, params, **kwargs):
+    """ Finds every vertex but eid 99 """
+    return [vertex_json(eid, count=eid) if eid != 99 else None for eid in params['eids']]
+
+
+class TestPrefetchVertices(TestCase):
+
+    def test_distinct_endpoints_are_fetched_once(self):
+        """ Tests that all the distinct endpoints are loaded in one query """
+        edges = [TestEdge(1, 2), TestEdge(1, 3), TestEdge(2, 3)]
+        with patch.object(models, 'execute_query', side_effect=fake_lookup) as execute_query:
+            prefetch_vertices(edges)
+            assert [(e.outV().count, e.inV().count) for e in edges] == [(1, 2), (1, 3), (2, 3)]
+        assert execute_query.call_count == 1
+        assert sorted(execute_query.call_args[0][1]['eids']) == [1, 2, 3]
+
+    def test_direction(self):
+        """ Tests that only the requested ends are fetched """
+        edges = [TestEdge(1, 2)]
+        with patch.object(models, 'execute_query', side_effect=fake_lookup) as execute_query:
+            prefetch_vertices(edges, 'in')
+        assert execute_query.call_args[0][1]['eids'] == [2]
+        assert edges[0]._outV == 1
+
+        with self.assertRaises(ThunderdomeException):
+            prefetch_vertices(edges, 'sideways')
+
+    def test_missing_vertices_are_left_alone(self):
+        """ Tests that ends whose vertex wasn't found keep their eid """
+        edges = [TestEdge(1, 99)]
+        with patch.object(models, 'execute_query', side_effect=fake_lookup):
+            prefetch_vertices(edges)
+        assert isinstance(edges[0]._outV, TestModel)
+        assert edges[0]._inV == 99
+
+    def test_out_edges_with_vertices(self):
+        """ Tests that outE(with_vertices=True) attaches the traversed and fetched vertices """
+        v = TestModel(_id=1, count=1)
+        with patch.object(gremlin, 'execute_query', return_value=[edge_json(10, 1, 2), edge_json(11, 1, 3)]):
+            with patch.object(models, 'execute_query', side_effect=fake_lookup) as execute_query:
+                edges = v.outE(TestEdge, with_vertices=True)
+        assert all(e.outV() is v for e in edges)
+        assert [e.inV().eid for e in edges] == [2, 3]
+        assert sorted(execute_query.call_args[0][1]['eids']) == [2, 3]
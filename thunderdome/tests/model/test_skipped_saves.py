@@ -0,0 +1,67 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import json
+from unittest import TestCase
+
+from mock import patch, Mock
+
+from thunderdome import connection, gremlin, properties
+from thunderdome.models import Vertex
+
+
+class ChangedOnlyVertex(Vertex):
+    __default_save_strategy__ = properties.SAVE_ONCHANGE
+
+    name = properties.Text()
+    count = properties.Integer()
+
+
+class TestSkippedSaves(TestCase):
+
+    def saved_vertex(self):
+        vertex = ChangedOnlyVertex(name='abc', count=1)
+        vertex.validate()
+        vertex._mark_saved(1)
+        return vertex
+
+    def test_unchanged_save_is_skipped(self):
+        """ Tests that saving an unchanged vertex doesn't query rexster """
+        vertex = self.saved_vertex()
+        with patch.object(gremlin, 'execute_query') as execute_query:
+            assert vertex.save() is vertex
+        assert not execute_query.called
+
+    def test_only_changed_columns_are_sent(self):
+        """ Tests that only the changed columns are sent """
+        vertex = self.saved_vertex()
+        vertex.count = 2
+        with patch.object(gremlin, 'execute_query', return_value=[{'_id': 1}]) as execute_query:
+            vertex.save()
+        assert execute_query.call_args[0][1]['attrs'] == {'count': 2, 'element_type': vertex.get_element_type()}
+
+    def test_skipped_bytes_are_reported(self):
+        """ Tests that the size of the unsent columns is reported to statsd """
+        vertex = self.saved_vertex()
+        statsd = Mock()
+        with patch.object(connection, '_statsd', statsd):
+            vertex.save()
+        context = 'vertices.{}.save'.format(vertex.get_element_type())
+        skipped = len(json.dumps(vertex.vid)) + len(json.dumps('abc')) + len(json.dumps(1))
+        statsd.incr.assert_any_call(context + '.skipped_bytes', skipped)
+        statsd.incr.assert_any_call(context + '.skipped', 1)
@@ -0,0 +1,95 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from datetime import datetime
+import json
+from unittest import TestCase
+from uuid import UUID
+
+from mock import patch
+
+from thunderdome import models
+from thunderdome.connection import ThunderdomeQueryError
+from thunderdome.models import GREATER_THAN
+from thunderdome.tests.mocks import vertex_json
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+class TestTraversalBuilder(TestCase):
+
+    def setUp(self):
+        self.v = TestModel(_id=1, count=1)
+
+    def test_compiled_script(self):
+        """ Tests that steps compile into one parameterized pipeline """
+        traversal = (self.v.traverse().out(TestEdge).in_('likes').has('count', 2.5, GREATER_THAN)
+                     .types(TestModel).dedup().order('count', reverse=True).range(5, 10))
+        script, params = traversal._compile('')
+        assert script == ("g.v(eid).out(*p0).in(*p1).has(p2, T.gt, p3 as double)"
+                          ".filter{it.element_type in p4}.dedup()"
+                          ".order{it.b.getProperty(p5) <=> it.a.getProperty(p5)}[p6..<p7]")
+        assert params == {'eid': 1, 'p0': [TestEdge.get_label()], 'p1': ['likes'], 'p2': 'count', 'p3': 2.5,
+                          'p4': [TestModel.get_element_type()], 'p5': 'count', 'p6': 5, 'p7': 10}
+
+    def test_steps_are_immutable(self):
+        """ Tests that each step returns a new traversal """
+        base = self.v.traverse().out()
+        a = base.limit(1)
+        b = base.limit(2)
+        assert len(base._steps) == 1
+        assert a._compile('')[1]['p1'] == 1
+        assert b._compile('')[1]['p1'] == 2
+
+    def test_scripts_are_cached_by_shape(self):
+        """ Tests that traversals of the same shape reuse the same script text """
+        a = self.v.traverse().outE('a').inV().has('count', 1)._compile('')[0]
+        b = TestModel(_id=2).traverse().outE('b', 'c').inV().has('text', 'x')._compile('')[0]
+        assert a is b
+
+    def test_edge_types(self):
+        """ Tests that edge classes filter on labels """
+        script, params = self.v.traverse().outE().types(TestEdge, TestModel)._compile('')
+        assert script == 'g.v(eid).outE(*p0).filter{it.element_type in p1 || it.label in p2}'
+
+    def test_values_are_converted(self):
+        """ Tests that step values are converted like gremlin method arguments """
+        created = datetime(2013, 1, 1)
+        vid = UUID('a3f94ae7-4c97-4b9f-a30e-6d77a6e4a1a3')
+        other = TestModel(_id=5, count=5)
+        script, params = (self.v.traverse().out().has('created', created).has('vid', vid)
+                          .has('friend', other)._compile(''))
+        assert params['p2'] == 1356998400.0
+        assert params['p4'] == str(vid)
+        assert params['p6'] == 5
+        json.dumps(params)
+
+    def test_types_need_a_class(self):
+        """ Tests that an empty types step is rejected instead of dropping every result """
+        with self.assertRaises(ThunderdomeQueryError):
+            self.v.traverse().out().types()
+
+    def test_execution(self):
+        """ Tests that traversals run as a single query """
+        with patch.object(models, 'execute_query', return_value=[vertex_json(2, count=2), vertex_json(3, count=3)]) as execute_query:
+            results = self.v.traverse().out().out().limit(2).all()
+        assert [r.eid for r in results] == [2, 3]
+        assert execute_query.call_count == 1
+
+        with patch.object(models, 'execute_query', return_value=[7]) as execute_query:
+            assert self.v.traverse().out().count() == 7
+        assert execute_query.call_args[0][0] == 'g.v(eid).out(*p0).count()'
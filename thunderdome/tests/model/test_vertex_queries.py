@@ -73,3 +73,17 @@ class SimpleQueryTest(BaseThunderdomeTestCase):
         result = self.q.interval('fierceness', 2.5, 5.2)._get_partial()
         assert result == "g.v(eid).query().interval('fierceness', v0 as double, v1 as double)", result
 
+
+    def test_queries_are_immutable(self):
+        q = self.q.has('age', 21)
+        with self.assertRaises(AttributeError):
+            q._limit = 10
+        q2 = q.has('name', 'bob')
+        assert len(q._has) == 1
+        assert len(q2._has) == 2
+
+    def test_script_is_stable(self):
+        q = self.q.has('age', 21).interval('height', 1, 2)
+        assert q._get_partial() is q._get_partial()
+        assert q._get_partial() is self.q.has('age', 30).interval('height', 5, 3)._get_partial()
+        assert q._params() == {'v0': 21, 'v1': 1, 'v2': 2, 'eid': 1, 'limit': None}
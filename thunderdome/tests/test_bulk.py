@@ -0,0 +1,152 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from itertools import count
+import json
+import os
+from StringIO import StringIO
+import tempfile
+from unittest import TestCase
+from uuid import uuid4
+
+from mock import patch
+
+from thunderdome import bulk, connection, gremlin, models
+from thunderdome.tests.models import TestModel, TestEdge
+
+
+def fake_save(eids):
+    """ Returns an execute_query replacement assigning eids to new elements """
+    def execute_query(query, params, **kwargs):
+        items = params.get('vertices', params.get('edges'))
+        return [item['eid'] if item['eid'] is not None else next(eids) for item in items]
+    return execute_query
+
+
+def vertex_record(vid, count):
+    return {'element_type': TestModel.get_element_type(), 'vid': vid, 'count': count}
+
+
+def edge_record(outV, inV, numbers):
+    return {'label': TestEdge.get_label(), 'outV': outV, 'inV': inV, 'numbers': numbers}
+
+
+class TestReadRecords(TestCase):
+
+    def test_jsonl(self):
+        """ Tests that jsonl lines are parsed and blank lines are skipped """
+        stream = StringIO('{"a": 1}\n\n{"a": 2}\n')
+        assert list(bulk.read_records(stream)) == [{'a': 1}, {'a': 2}]
+
+    def test_csv(self):
+        """ Tests that csv rows are read as dicts without the empty fields """
+        stream = StringIO('a,b\n1,\n2,3\n')
+        assert list(bulk.read_records(stream, 'csv')) == [{'a': '1'}, {'a': '2', 'b': '3'}]
+
+
+class TestBulkLoader(TestCase):
+
+    def setUp(self):
+        self.vids = [str(uuid4()) for i in range(3)]
+        self.records = [vertex_record(vid, i) for i, vid in enumerate(self.vids)]
+        self.records += [edge_record(self.vids[0], self.vids[1], 1), edge_record(self.vids[1], self.vids[2], 2)]
+
+    def load(self, loader, records):
+        hosts = [connection.Host('a', 1), connection.Host('b', 1)]
+        with patch.object(connection, '_hosts', hosts):
+            with patch.object(gremlin, 'execute_query', side_effect=fake_save(count(1))) as execute_query:
+                stats = loader.load(records)
+        return stats, execute_query.call_args_list
+
+    def test_vertices_and_edges_are_loaded_in_batches(self):
+        """ Tests that records are written in batches and edges use the new vertex eids """
+        stats, calls = self.load(bulk.BulkLoader(batch_size=2, workers=2), self.records)
+        assert (stats['vertices'], stats['edges'], stats['invalid'], stats['batches']) == (3, 2, 0, 3)
+        assert stats['offset'] == 5
+        edges = [item for call in calls if 'edges' in call[0][1] for item in call[0][1]['edges']]
+        assert [(e['outV'], e['inV']) for e in edges] == [(1, 2), (2, 3)]
+        assert set(call[1]['host'].name for call in calls) == set(['a', 'b'])
+
+    def test_unknown_vertices_are_looked_up(self):
+        """ Tests that edge endpoints missing from the vid cache are looked up """
+        loader = bulk.BulkLoader()
+        with patch.object(models, 'execute_query', return_value=[None, None]) as lookup:
+            stats, calls = self.load(loader, self.records[3:])
+        assert sorted(lookup.call_args[0][1]['vids']) == sorted(self.vids)
+        assert (stats['edges'], stats['invalid']) == (0, 2)
+
+    def test_invalid_records(self):
+        """ Tests that invalid records are skipped, or abort strict loads """
+        records = [vertex_record(self.vids[0], 'a'), {'element_type': 'unknown'}, vertex_record(self.vids[1], 1)]
+        stats, calls = self.load(bulk.BulkLoader(), records)
+        assert (stats['vertices'], stats['invalid']) == (1, 2)
+
+        with self.assertRaises(ValueError):
+            self.load(bulk.BulkLoader(strict=True), records)
+
+    def test_resume_from_checkpoint(self):
+        """ Tests that loads skip the records written before the checkpoint """
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with open(path, 'w') as f:
+                json.dump({'offset': 2}, f)
+            stats, calls = self.load(bulk.BulkLoader(checkpoint=path), self.records[:3])
+            assert stats['vertices'] == 1
+            assert calls[0][0][1]['vertices'][0]['attrs']['vid'] == self.vids[2]
+            with open(path) as f:
+                assert json.load(f) == {'offset': 3, 'committed': []}
+        finally:
+            os.remove(path)
+
+    def test_batches_after_a_failure_are_checkpointed(self):
+        """ Tests that batches committed after a failed one aren't written again on resume """
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(path)
+        saves = fake_save(count(1))
+
+        def fail_second(query, params, **kwargs):
+            if params['vertices'][0]['attrs']['vid'] == self.vids[1]:
+                raise connection.ThunderdomeQueryError('write failed')
+            return saves(query, params, **kwargs)
+
+        records = self.records[:3] + [vertex_record(str(uuid4()), 3)]
+        try:
+            loader = bulk.BulkLoader(checkpoint=path, batch_size=1, workers=4, max_pending=4)
+            with patch.object(gremlin, 'execute_query', side_effect=fail_second):
+                with self.assertRaises(Exception):
+                    loader.load(records)
+            with open(path) as f:
+                assert json.load(f) == {'offset': 1, 'committed': [[2, 4]]}
+
+            stats, calls = self.load(bulk.BulkLoader(checkpoint=path), records)
+            assert [call[0][1]['vertices'][0]['attrs']['vid'] for call in calls] == [self.vids[1]]
+            with open(path) as f:
+                assert json.load(f) == {'offset': 4, 'committed': []}
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_written_vertices_are_not_looked_up(self):
+        """ Tests that edge batches don't evict the vids of the vertices the load wrote """
+        records = self.records + [edge_record(self.vids[1], self.vids[0], 3), edge_record(self.vids[2], self.vids[1], 4)]
+        with patch.object(models, 'execute_query') as lookup:
+            stats, calls = self.load(bulk.BulkLoader(batch_size=1, max_pending=1), records)
+        assert lookup.call_count == 0
+        assert (stats['edges'], stats['invalid']) == (4, 0)
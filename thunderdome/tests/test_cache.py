@@ -0,0 +1,141 @@
+# Copyright (c) 2012-2013 SHIFT.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import time
+from unittest import TestCase
+
+from mock import patch
+
+from thunderdome import cache
+from thunderdome import gremlin
+from thunderdome import properties
+from thunderdome.models import Vertex
+
+
+method_cache = cache.TTLCache(ttl=30, maxsize=100)
+
+
+class CachedTestModel(Vertex):
+    gremlin_path = 'groovy/groovy_test_model.groovy'
+
+    text = properties.Text()
+    tags = properties.List()
+
+    return_value = gremlin.GremlinMethod(cache=method_cache)
+    return_list = gremlin.GremlinMethod(cache=method_cache)
+    return_scalar = gremlin.GremlinMethod(method_name='return_value', returns='scalar', cache=method_cache)
+
+
+class TestTTLCache(TestCase):
+
+    def test_get_and_set(self):
+        """ Tests that cached values are returned and misses raise KeyErrors """
+        c = cache.TTLCache()
+        c.set('a', 1)
+        assert c.get('a') == 1
+        with self.assertRaises(KeyError):
+            c.get('b')
+        assert c.stats() == {'hits': 1, 'misses': 1, 'evictions': 0, 'hit_rate': 0.5, 'size': 1}
+
+    def test_expiry(self):
+        """ Tests that entries expire after the ttl """
+        c = cache.TTLCache(ttl=0.01)
+        c.set('a', 1)
+        time.sleep(0.02)
+        with self.assertRaises(KeyError):
+            c.get('a')
+        assert len(c) == 0
+
+    def test_lru_eviction(self):
+        """ Tests that the least recently used entry is evicted when full """
+        c = cache.TTLCache(maxsize=2)
+        c.set('a', 1)
+        c.set('b', 2)
+        c.get('a')
+        c.set('c', 3)
+        assert c.get('a') == 1
+        with self.assertRaises(KeyError):
+            c.get('b')
+        assert c.evictions == 1
+
+    def test_tag_invalidation(self):
+        """ Tests that entries are invalidated by their tags """
+        c = cache.TTLCache()
+        c.set('a', 1, tags=['x', 'y'])
+        c.set('b', 2, tags=['y'])
+        c.set('c', 3, tags=['z'])
+        c.invalidate('y')
+        assert len(c) == 1
+        assert c.get('c') == 3
+
+    def test_invalidate_element(self):
+        """ Tests that elements are invalidated in every cache """
+        c1, c2 = cache.TTLCache(), cache.TTLCache()
+        c1.set('a', 1, tags=[cache.element_tag(5)])
+        c2.set('b', 2, tags=[cache.element_tag(5)])
+        cache.invalidate_element(5)
+        assert len(c1) == len(c2) == 0
+
+
+class TestGremlinMethodCaching(TestCase):
+
+    def setUp(self):
+        method_cache.clear()
+        self.v = CachedTestModel(_id=10)
+
+    def test_results_are_cached(self):
+        """ Tests that calls with the same parameters are only executed once """
+        with patch.object(gremlin, 'execute_query', return_value=[1]) as execute_query:
+            assert self.v.return_value(1) == [1]
+            assert self.v.return_value(1) == [1]
+            assert self.v.return_value(2) == [1]
+        assert execute_query.call_count == 2
+
+    def test_cached_results_are_copied(self):
+        """ Tests that mutating a returned result doesn't change the cached one """
+        other = {'_id': 20, '_type': 'vertex', 'element_type': CachedTestModel.get_element_type(), 'tags': ['x']}
+        with patch.object(gremlin, 'execute_query', side_effect=[[1, 2, 3], [other]]) as execute_query:
+            self.v.return_scalar(1).append('mutated')
+            result = self.v.return_scalar(1)
+            result.append('mutated')
+            assert self.v.return_scalar(1) == [1, 2, 3]
+            self.v.return_value(2)[0].tags.append('mutated')
+            assert self.v.return_value(2)[0].tags == ['x']
+        assert execute_query.call_count == 2
+
+    def test_method_invalidation(self):
+        """ Tests that invalidating a method only removes its results """
+        with patch.object(gremlin, 'execute_query', return_value=[1]) as execute_query:
+            self.v.return_value(1)
+            self.v.return_list()
+            CachedTestModel.return_value.invalidate_cache()
+            self.v.return_value(1)
+            self.v.return_list()
+        assert execute_query.call_count == 3
+
+    def test_element_invalidation(self):
+        """ Tests that results are invalidated by the calling element and elements they contain """
+        other = {'_id': 20, '_type': 'vertex', 'element_type': CachedTestModel.get_element_type()}
+        with patch.object(gremlin, 'execute_query', return_value=[other]) as execute_query:
+            self.v.return_value(1)
+            cache.invalidate_element(10)
+            self.v.return_value(1)
+            cache.invalidate_element(20)
+            self.v.return_value(1)
+        assert execute_query.call_count == 3
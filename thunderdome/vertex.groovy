@@ -1,10 +1,12 @@
 
-def _save_vertex(eid, attrs) {
+def _save_vertex(eid, attrs, fields) {
     /**
      * Saves a vertex
      *
      * :param eid: edge id, if null, a new vertex is created
      * :param attrs: map of parameters to set on the edge
+     * :param fields: list of properties whose saved values are returned
+     * :returns: a map of the vertex id under _id and the requested properties
      */
     try {
         v = eid == null ? g.addVertex() : g.v(eid)
@@ -17,7 +19,63 @@ def _save_vertex(eid, attrs) {
             }
         }
         g.stopTransaction(SUCCESS)
-        return g.getVertex(v.id)
+        def result = ['_id': v.id]
+        for (field in fields) {
+            result[field] = v.getProperty(field)
+        }
+        return result
+    } catch (err) {
+        g.stopTransaction(FAILURE)
+        throw(err)
+    }
+}
+
+def _save_vertices(vertices) {
+    /**
+     * Saves a list of vertices in a single transaction
+     *
+     * :param vertices: list of maps with the eid (null for new vertices) and
+     * attrs of each vertex, as passed to _save_vertex
+     * :returns: the eids of the saved vertices, in order
+     */
+    try {
+        saved = vertices.collect{ item ->
+            def v = item.eid == null ? g.addVertex() : g.v(item.eid)
+            for (attr in item.attrs.entrySet()) {
+                if (attr.value == null) {
+                    v.removeProperty(attr.key)
+                } else {
+                    v.setProperty(attr.key, attr.value)
+                }
+            }
+            v
+        }
+        g.stopTransaction(SUCCESS)
+        return saved.collect{it.id}
+    } catch (err) {
+        g.stopTransaction(FAILURE)
+        throw(err)
+    }
+}
+
+def _delete_vertices(eids) {
+    /**
+     * Deletes a list of vertices in a single transaction
+     *
+     * :param eids: the eids of the vertices to delete, missing ones are skipped
+     * :returns: the number of vertices deleted
+     */
+    try {
+        deleted = 0
+        for (eid in eids) {
+            def v = g.v(eid)
+            if (v != null) {
+                g.removeVertex(v)
+                deleted++
+            }
+        }
+        g.stopTransaction(SUCCESS)
+        return deleted
     } catch (err) {
         g.stopTransaction(FAILURE)
         throw(err)
@@ -32,7 +90,11 @@ def _traversal(eid, operation, labels, start, end, element_types) {
      * :param label: the edge label to filter on
      * :param page_num: the page number to start on (pagination begins at 1)
      * :param per_page: number of objects to return per page
-     * :param element_types: list of allowed element types for results
+     * :param element_types: list of allowed element types for results, for the
+     * edge and vertex pairs of outEV and inEV these apply to the vertices and
+     * for edges they're labels. The filter runs before the range is taken so
+     * pages are filled with matching elements and the pipe stops as soon as
+     * the page is full
      */
     results = g.v(eid)
     label_args = labels == null ? [] : labels
@@ -55,14 +117,122 @@ def _traversal(eid, operation, labels, start, end, element_types) {
         case "bothV":
             results = results.both(*label_args)
             break
+        case "outEV":
+            results = results.outE(*label_args).transform{[it, it.getVertex(Direction.IN)]}
+            break
+        case "inEV":
+            results = results.inE(*label_args).transform{[it, it.getVertex(Direction.OUT)]}
+            break
         default:
             throw NamingException()
     }
+    if (element_types != null) {
+      if (operation in ["outEV", "inEV"]) {
+        results = results.filter{it[1].element_type in element_types}
+      } else if (operation in ["inE", "outE", "bothE"]) {
+        results = results.filter{it.label in element_types}
+      } else {
+        results = results.filter{it.element_type in element_types}
+      }
+    }
     if (start != null && end != null) {
         results = results[start..<end]
     }
-    if (element_types != null) {
-      results = results.filter{it.element_type in element_types}
+    return results
+}
+
+def _keyset_traversal(eid, operation, labels, sort_key, after, seen, limit, element_types) {
+    /**
+     * performs vertex/edge traversals paginated by an edge sort key, each page
+     * seeks to the key the previous one ended at instead of skipping over an
+     * offset. The sort key should be the primary key of the edge labels so
+     * titan returns the edges in key order from its vertex centric index.
+     *
+     * :param eid: vertex eid to start from
+     * :param operation: outV, outE, inV or inE
+     * :param labels: the edge labels to filter on
+     * :param sort_key: the edge property the results are ordered by
+     * :param after: the sort key value the previous page ended at, null for the first page
+     * :param seen: ids of the edges with the `after` key returned by previous pages
+     * :param limit: number of results to return
+     * :param element_types: list of allowed element types for results
+     * :returns: a list of [sort key value, edge id, result] triples
+     */
+    def direction = operation in ["outV", "outE"] ? Direction.OUT : Direction.IN
+    def other = direction == Direction.OUT ? Direction.IN : Direction.OUT
+    def vertices = operation in ["outV", "inV"]
+    if (!(operation in ["outV", "outE", "inV", "inE"])) {
+        throw NamingException()
+    }
+    def query = g.v(eid).query().direction(direction)
+    if (labels) {
+        query = query.labels(*labels)
+    }
+    if (after != null) {
+        query = query.has(sort_key, after, Query.Compare.GREATER_THAN_EQUAL)
+    }
+    if (element_types == null) {
+        query = query.limit(limit + seen.size())
+    }
+    def results = []
+    for (e in query.edges()) {
+        def key = e.getProperty(sort_key)
+        if (after != null && key == after && e.id in seen) {
+            continue
+        }
+        def result = vertices ? e.getVertex(other) : e
+        if (element_types != null && !((vertices ? result.element_type : result.label) in element_types)) {
+            continue
+        }
+        results << [key, e.id, result]
+        if (results.size() >= limit) {
+            break
+        }
+    }
+    return results
+}
+
+def _degrees(eids, direction, labels, element_types, by_label) {
+    /**
+     * counts the edges of each of the given vertices without returning them
+     *
+     * :param eids: the vertex eids to count edges of
+     * :param direction: OUT, IN or BOTH
+     * :param labels: the edge labels to count, all labels when empty
+     * :param element_types: list of allowed element types of the vertices at
+     * the other end of the edges, null to count all edges
+     * :param by_label: return a map of counts keyed by edge label instead of a total
+     * :returns: a list of [eid, count] pairs, the count is null for missing vertices
+     */
+    def dir = Direction.valueOf(direction)
+    def results = []
+    for (eid in eids) {
+        def v = g.v(eid)
+        if (v == null) {
+            results << [eid, null]
+            continue
+        }
+        def query = v.query().direction(dir)
+        if (labels) {
+            query = query.labels(*labels)
+        }
+        if (element_types == null && !by_label) {
+            results << [eid, query.count()]
+            continue
+        }
+        def counts = [:]
+        def total = 0
+        for (e in query.edges()) {
+            if (element_types != null) {
+                def other = e.getVertex(Direction.IN) == v ? e.getVertex(Direction.OUT) : e.getVertex(Direction.IN)
+                if (!(other.element_type in element_types)) {
+                    continue
+                }
+            }
+            counts[e.label] = counts.get(e.label, 0) + 1
+            total += 1
+        }
+        results << [eid, by_label ? counts : total]
     }
     return results
 }